@@ -5,8 +5,14 @@ import logging
 import asyncio
 from typing import Any
 
+import voluptuous as vol
+
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.const import Platform, EVENT_HOMEASSISTANT_STOP
+from homeassistant.const import (
+    Platform,
+    EVENT_HOMEASSISTANT_STOP,
+    EVENT_HOMEASSISTANT_CLOSE,
+)
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.config_entries import ConfigEntry
@@ -14,6 +20,14 @@ from homeassistant.config_entries import ConfigEntry
 from .mcp_core import http, MCPServerManager, SessionManager
 from .services import LineBotServiceManager
 from .line_api_client import LineApiClient
+from .quota import QuotaLedger
+from .coalescer import PushCoalescer
+from .dispatcher import MessageDispatcher
+from .dedup import WebhookEventDeduplicator
+from .webhook_executor import WebhookEventExecutor
+from .debounce import AutoReplyDebouncer
+from .conversation_cache import ConversationCache
+from .message_schema import DEFAULT_AUTO_REPLY_PROMPT
 from .webhook import LineBotWebhookView
 from .coordinator import (
     LineBotInfoCoordinator,
@@ -28,6 +42,27 @@ from .const import (
     CONF_WEBHOOK_PATH,
     CONF_AGENT_ID,
     CONF_AUTO_REPLY,
+    CONF_POOL_SIZE,
+    CONF_PUSH_COALESCE_WINDOW,
+    CONF_DISPATCH_WORKERS,
+    CONF_DISPATCH_QUEUE_SIZE,
+    CONF_PERSIST_WEBHOOK_DEDUP,
+    CONF_FAST_WEBHOOK_DECODER,
+    CONF_WEBHOOK_CONCURRENCY,
+    CONF_WEBHOOK_QUEUE_SIZE,
+    CONF_WEBHOOK_SHED_POLICY,
+    CONF_AUTO_REPLY_DEBOUNCE,
+    CONF_AUTO_REPLY_PROMPT,
+    CONF_AUTO_REPLY_SCHEMA_ONCE,
+    CONF_AUTO_REPLY_LOADING,
+    CONF_AUTO_REPLY_PARTIAL_AFTER,
+    CONF_AUTO_REPLY_PARTIAL_TEXT,
+    CONF_CONVERSATION_CACHE_SIZE,
+    CONF_MCP_STREAM_BUFFER,
+    CONF_MCP_BUFFER_POLICY,
+    CONF_MCP_BUFFER_TIMEOUT,
+    CONF_MCP_TOOL_CONCURRENCY,
+    CONF_MCP_SESSION_TOOL_CONCURRENCY,
     SERVICE_MANAGER,
     SESSION_MANAGER,
     SERVER_MANAGER,
@@ -36,12 +71,57 @@ from .const import (
     LINEBOT_INFO_COORDINATOR,
     LINEBOT_QUOTA_COORDINATOR,
     LINE_API_CLIENT,
+    LINE_API_POOL_SIZE,
+    QUOTA_LEDGER,
+    PUSH_COALESCER,
+    MESSAGE_DISPATCHER,
+    WEBHOOK_DEDUP,
+    WEBHOOK_EXECUTOR,
+    AUTO_REPLY_DEBOUNCER,
+    CONVERSATION_CACHE,
+    CONVERSATION_CACHE_SIZE,
+    DISPATCH_WORKERS,
+    DISPATCH_QUEUE_SIZE,
+    WEBHOOK_CONCURRENCY,
+    WEBHOOK_QUEUE_SIZE,
+    SHED_POLICY_DROP_NEWEST,
+    DEFAULT_AUTO_REPLY_PARTIAL_TEXT,
+    MCP_STREAM_BUFFER_SIZE,
+    MCP_BUFFER_TIMEOUT,
+    MCP_BUFFER_POLICY_BLOCK,
+    MCP_BUFFER_POLICY_REJECT,
+    MCP_TOOL_CONCURRENCY,
+    MCP_SESSION_TOOL_CONCURRENCY,
 )
 
 
 _LOGGER = logging.getLogger(__name__)
 PLATFORMS: list[Platform] = [Platform.SENSOR]
 
+# Bot 透過設定流程新增；YAML 僅用於全域的 MCP 會話設定
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema({
+            vol.Optional(CONF_MCP_STREAM_BUFFER, default=MCP_STREAM_BUFFER_SIZE): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=1000)
+            ),
+            vol.Optional(CONF_MCP_BUFFER_POLICY, default=MCP_BUFFER_POLICY_BLOCK): vol.In(
+                [MCP_BUFFER_POLICY_BLOCK, MCP_BUFFER_POLICY_REJECT]
+            ),
+            vol.Optional(CONF_MCP_BUFFER_TIMEOUT, default=MCP_BUFFER_TIMEOUT): vol.All(
+                vol.Coerce(float), vol.Range(min=0, max=60)
+            ),
+            vol.Optional(CONF_MCP_TOOL_CONCURRENCY, default=MCP_TOOL_CONCURRENCY): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=100)
+            ),
+            vol.Optional(
+                CONF_MCP_SESSION_TOOL_CONCURRENCY, default=MCP_SESSION_TOOL_CONCURRENCY
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+        })
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """設置 LINE Bot MCP 組件"""
@@ -58,14 +138,26 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     cancel = hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, handle_shutdown)
     hass.data.setdefault(DOMAIN, {})
     
+    mcp_config = config.get(DOMAIN, {})
+
     # 設定全域 LINE Bot 服務
     service_manager = LineBotServiceManager(hass)
     await service_manager.setup_services()
 
     hass.data[DOMAIN].update({
         SERVICE_MANAGER: service_manager,
-        SESSION_MANAGER: SessionManager(),
-        SERVER_MANAGER: MCPServerManager(hass),
+        SESSION_MANAGER: SessionManager(
+            buffer_size=mcp_config.get(CONF_MCP_STREAM_BUFFER, MCP_STREAM_BUFFER_SIZE),
+            full_policy=mcp_config.get(CONF_MCP_BUFFER_POLICY, MCP_BUFFER_POLICY_BLOCK),
+            send_timeout=mcp_config.get(CONF_MCP_BUFFER_TIMEOUT, MCP_BUFFER_TIMEOUT),
+        ),
+        SERVER_MANAGER: MCPServerManager(
+            hass,
+            max_tool_calls=mcp_config.get(CONF_MCP_TOOL_CONCURRENCY, MCP_TOOL_CONCURRENCY),
+            max_session_tool_calls=mcp_config.get(
+                CONF_MCP_SESSION_TOOL_CONCURRENCY, MCP_SESSION_TOOL_CONCURRENCY
+            ),
+        ),
         STOP_LISTENER: cancel,
         SHUTDOWN_EVENT: asyncio.Event(),
     })
@@ -85,24 +177,108 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         CONF_SERVICE_NAME: entry.data[CONF_SERVICE_NAME],
         CONF_AGENT_ID: entry.options.get(CONF_AGENT_ID),
         CONF_AUTO_REPLY: entry.options.get(CONF_AUTO_REPLY),
+        CONF_AUTO_REPLY_PROMPT: entry.options.get(CONF_AUTO_REPLY_PROMPT) or DEFAULT_AUTO_REPLY_PROMPT,
+        CONF_AUTO_REPLY_SCHEMA_ONCE: entry.options.get(CONF_AUTO_REPLY_SCHEMA_ONCE, False),
+        CONF_AUTO_REPLY_LOADING: entry.options.get(CONF_AUTO_REPLY_LOADING, True),
+        CONF_AUTO_REPLY_PARTIAL_AFTER: entry.options.get(CONF_AUTO_REPLY_PARTIAL_AFTER, 0),
+        CONF_AUTO_REPLY_PARTIAL_TEXT: (
+            entry.options.get(CONF_AUTO_REPLY_PARTIAL_TEXT) or DEFAULT_AUTO_REPLY_PARTIAL_TEXT
+        ),
+        CONF_FAST_WEBHOOK_DECODER: entry.options.get(CONF_FAST_WEBHOOK_DECODER, True),
     }
 
-    # 建立 LINE API 客戶端
-    config_data[LINE_API_CLIENT] = LineApiClient(hass, config_data[CONF_TOKEN])
-    hass.data[DOMAIN][entry.entry_id] = config_data
+    # 本地累計配額用量，減少向 LINE 查詢的次數
+    quota_ledger = QuotaLedger()
+    config_data[QUOTA_LEDGER] = quota_ledger
 
-    # 設定 webhook
-    await _setup_webhook(hass, config_data, entry.entry_id)
-    
-    # 初始化協調器
-    info_coordinator = LineBotInfoCoordinator(hass, entry)
-    quota_coordinator = LineBotQuotaCoordinator(hass, entry)
-    await info_coordinator.async_config_entry_first_refresh()
-    await quota_coordinator.async_config_entry_first_refresh()
-    hass.data[DOMAIN][entry.entry_id].update({
-        LINEBOT_INFO_COORDINATOR: info_coordinator,
-        LINEBOT_QUOTA_COORDINATOR: quota_coordinator,
-    })
+    # 建立 LINE API 客戶端（每個 Bot 使用獨立連線池）
+    line_api_client = LineApiClient(
+        hass,
+        config_data[CONF_TOKEN],
+        pool_size=int(entry.options.get(CONF_POOL_SIZE, LINE_API_POOL_SIZE)),
+        quota_ledger=quota_ledger,
+    )
+    config_data[LINE_API_CLIENT] = line_api_client
+
+    try:
+        # 建立外送訊息派送佇列
+        dispatcher = MessageDispatcher(
+            hass,
+            config_data[CONF_NAME],
+            line_api_client,
+            workers=int(entry.options.get(CONF_DISPATCH_WORKERS, DISPATCH_WORKERS)),
+            max_queue_size=int(entry.options.get(CONF_DISPATCH_QUEUE_SIZE, DISPATCH_QUEUE_SIZE)),
+        )
+        dispatcher.start(entry)
+        config_data[MESSAGE_DISPATCHER] = dispatcher
+
+        # 合併相同內容的 push 訊息（窗口為 0 時停用）
+        if coalesce_window := entry.options.get(CONF_PUSH_COALESCE_WINDOW, 0):
+            config_data[PUSH_COALESCER] = PushCoalescer(
+                hass, line_api_client, coalesce_window / 1000, dispatcher
+            )
+
+        # 過濾 LINE 重送的 webhook 事件
+        dedup = WebhookEventDeduplicator(
+            hass,
+            entry.entry_id,
+            persist=entry.options.get(CONF_PERSIST_WEBHOOK_DEDUP, False),
+        )
+        await dedup.async_load()
+        config_data[WEBHOOK_DEDUP] = dedup
+
+        # 限制 webhook 事件同時處理的數量
+        config_data[WEBHOOK_EXECUTOR] = WebhookEventExecutor(
+            hass,
+            entry,
+            config_data[CONF_NAME],
+            max_concurrency=int(entry.options.get(CONF_WEBHOOK_CONCURRENCY, WEBHOOK_CONCURRENCY)),
+            max_pending=int(entry.options.get(CONF_WEBHOOK_QUEUE_SIZE, WEBHOOK_QUEUE_SIZE)),
+            shed_policy=entry.options.get(CONF_WEBHOOK_SHED_POLICY, SHED_POLICY_DROP_NEWEST),
+        )
+
+        # 自動回覆的對話上下文
+        config_data[CONVERSATION_CACHE] = ConversationCache(
+            max_entries=int(entry.options.get(CONF_CONVERSATION_CACHE_SIZE, CONVERSATION_CACHE_SIZE)),
+        )
+
+        # 合併同一對話連續傳送的訊息後再自動回覆（窗口為 0 時停用）
+        if debounce_window := entry.options.get(CONF_AUTO_REPLY_DEBOUNCE, 0):
+            config_data[AUTO_REPLY_DEBOUNCER] = AutoReplyDebouncer(
+                hass, config_data[WEBHOOK_EXECUTOR], debounce_window
+            )
+        hass.data[DOMAIN][entry.entry_id] = config_data
+        hass.data[DOMAIN][SERVER_MANAGER].bots_changed()
+
+        async def _close_client(event) -> None:
+            """Home Assistant 關閉時釋放連線池"""
+            await line_api_client.close()
+
+        entry.async_on_unload(
+            hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _close_client)
+        )
+
+        # 設定 webhook
+        await _setup_webhook(hass, config_data, entry.entry_id)
+
+        # 初始化協調器
+        info_coordinator = LineBotInfoCoordinator(hass, entry)
+        quota_coordinator = LineBotQuotaCoordinator(hass, entry)
+        # 兩個協調器的首次更新同時進行，縮短啟動時間
+        await asyncio.gather(
+            info_coordinator.async_config_entry_first_refresh(),
+            quota_coordinator.async_config_entry_first_refresh(),
+        )
+        hass.data[DOMAIN][entry.entry_id].update({
+            LINEBOT_INFO_COORDINATOR: info_coordinator,
+            LINEBOT_QUOTA_COORDINATOR: quota_coordinator,
+        })
+    except Exception:
+        # 設置失敗（例如首次更新失敗）時釋放已建立的資源，避免連線池與派送佇列遺留
+        if hass.data[DOMAIN].pop(entry.entry_id, None) is not None:
+            hass.data[DOMAIN][SERVER_MANAGER].bots_changed()
+        await _async_release_entry_data(config_data)
+        raise
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
@@ -127,7 +303,12 @@ async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """卸載配置項目"""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        config_data = hass.data[DOMAIN].pop(entry.entry_id)
+        await config_data[WEBHOOK_DEDUP].async_save()
+        await _async_release_entry_data(config_data)
+        # 重新載入後以新的 server 與初始化選項提供新會話
+        hass.data[DOMAIN][SERVER_MANAGER].invalidate()
+        hass.data[DOMAIN][SERVER_MANAGER].bots_changed()
         
         if not hass.config_entries.async_entries(DOMAIN):
             await hass.data[DOMAIN][SERVICE_MANAGER].remove_services()
@@ -143,6 +324,17 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return unload_ok
 
 
+async def _async_release_entry_data(config_data: dict[str, Any]) -> None:
+    """停止派送與合併工作並關閉 LINE API 客戶端"""
+    if debouncer := config_data.get(AUTO_REPLY_DEBOUNCER):
+        debouncer.close()
+    if coalescer := config_data.get(PUSH_COALESCER):
+        await coalescer.close()
+    if dispatcher := config_data.get(MESSAGE_DISPATCHER):
+        await dispatcher.stop()
+    await config_data[LINE_API_CLIENT].close()
+
+
 async def _setup_webhook(
     hass: HomeAssistant, 
     config_data: dict[str, Any],
@@ -0,0 +1,199 @@
+"""Push 訊息合併為 multicast 的佇列."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, LINE_MULTICAST_MAX_RECIPIENTS
+from .dispatcher import PRIORITY_PUSH
+from .line_api_client import LineApiError
+
+if TYPE_CHECKING:
+    from .dispatcher import MessageDispatcher
+    from .line_api_client import LineApiClient, LineApiResponse
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _PushBatch:
+    """相同訊息內容的待發送批次."""
+
+    def __init__(self, messages: List[Dict[str, Any]], notification_disabled: bool) -> None:
+        self.messages = messages
+        self.notification_disabled = notification_disabled
+        self.recipients: Dict[str, List[asyncio.Future]] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def add(self, to: str, future: asyncio.Future) -> None:
+        """加入收件者（同一收件者只會收到一次）."""
+        self.recipients.setdefault(to, []).append(future)
+
+    def resolve(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """將結果回傳給所有等待中的呼叫者."""
+        for to in self.recipients:
+            self.resolve_recipient(to, result, error)
+
+    def resolve_recipient(
+        self, to: str, result: Any = None, error: Optional[BaseException] = None
+    ) -> None:
+        """將結果回傳給等待同一收件者的呼叫者."""
+        for future in self.recipients[to]:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+class PushCoalescer:
+    """在短時間窗口內合併相同內容的 push 訊息.
+
+    LINE multicast 只接受 user ID，因此群組與聊天室仍以 push 發送；
+    multicast 因單一收件者無效等原因被拒絕時，改為逐一 push，只讓有問題的呼叫失敗。
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: LineApiClient,
+        window: float,
+        dispatcher: Optional[MessageDispatcher] = None,
+    ) -> None:
+        """初始化合併佇列.
+
+        :param window: 收集窗口（秒）
+        :param dispatcher: 批次送出時使用的派送佇列
+        """
+        self.hass = hass
+        self.client = client
+        self.window = window
+        self.dispatcher = dispatcher
+        self._batches: Dict[str, _PushBatch] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def _batch_key(messages: List[Dict[str, Any]], notification_disabled: bool) -> str:
+        """以訊息內容產生批次鍵值."""
+        return json.dumps(
+            [messages, notification_disabled],
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+
+    def add(
+        self,
+        to: str,
+        messages: List[Dict[str, Any]],
+        notification_disabled: bool = False,
+    ) -> asyncio.Future:
+        """排入合併佇列，回傳發送結果的 future."""
+        future = self.hass.loop.create_future()
+
+        if not to.startswith("U"):
+            batch = _PushBatch(messages, notification_disabled)
+            batch.add(to, future)
+            self._start_send(batch)
+            return future
+
+        key = self._batch_key(messages, notification_disabled)
+        if (batch := self._batches.get(key)) is None:
+            batch = self._batches[key] = _PushBatch(messages, notification_disabled)
+            batch.timer = self.hass.loop.call_later(self.window, self._flush, key)
+
+        batch.add(to, future)
+
+        if len(batch.recipients) >= LINE_MULTICAST_MAX_RECIPIENTS:
+            self._flush(key)
+
+        return future
+
+    def _flush(self, key: str) -> None:
+        """送出批次."""
+        if (batch := self._batches.pop(key, None)) is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        self._start_send(batch)
+
+    def _start_send(self, batch: _PushBatch) -> None:
+        """建立發送工作."""
+        task = self.hass.async_create_task(
+            self._send(batch), f"{DOMAIN}: coalesced push"
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: _PushBatch) -> None:
+        """發送批次（單一收件者使用 push，多位收件者使用 multicast）."""
+        recipients = list(batch.recipients)
+
+        async def _request() -> LineApiResponse:
+            if len(recipients) == 1:
+                return await self.client.push_message(
+                    to=recipients[0],
+                    messages=batch.messages,
+                    notification_disabled=batch.notification_disabled,
+                )
+            _LOGGER.debug(f"Coalesced {len(recipients)} push message(s) into one multicast")
+            return await self.client.multicast(
+                to=recipients,
+                messages=batch.messages,
+                notification_disabled=batch.notification_disabled,
+            )
+
+        try:
+            response = await self._run(_request, "coalesced push")
+        except LineApiError as e:
+            # 4xx 可能只是其中一位收件者無效或已封鎖（429 為速率或配額限制，逐一發送無濟於事）
+            if (
+                len(recipients) > 1
+                and e.status_code is not None
+                and 400 <= e.status_code < 500
+                and e.status_code != 429
+            ):
+                _LOGGER.debug(f"Coalesced multicast rejected ({e}), falling back to individual push")
+                await asyncio.gather(*(self._push_one(batch, to) for to in recipients))
+            else:
+                batch.resolve(error=e)
+        except Exception as e:
+            batch.resolve(error=e)
+        else:
+            batch.resolve(response)
+
+    async def _push_one(self, batch: _PushBatch, to: str) -> None:
+        """以單獨的 push 發送給一位收件者."""
+
+        async def _request() -> LineApiResponse:
+            return await self.client.push_message(
+                to=to,
+                messages=batch.messages,
+                notification_disabled=batch.notification_disabled,
+            )
+
+        try:
+            response = await self._run(_request, "push")
+        except Exception as e:
+            batch.resolve_recipient(to, error=e)
+        else:
+            batch.resolve_recipient(to, response)
+
+    async def _run(self, request: Callable[[], Awaitable[Any]], description: str) -> Any:
+        """經由派送佇列（若有）執行請求."""
+        if self.dispatcher is not None:
+            return await self.dispatcher.run(PRIORITY_PUSH, request, description)
+        return await request()
+
+    async def close(self) -> None:
+        """立即送出所有待發送批次並等待完成."""
+        for key in list(self._batches):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
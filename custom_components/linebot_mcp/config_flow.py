@@ -15,8 +15,15 @@ from homeassistant.helpers.selector import (
     TextSelectorType,
     BooleanSelector,
     BooleanSelectorConfig,
+    NumberSelector,
+    NumberSelectorConfig,
+    NumberSelectorMode,
+    SelectSelector,
+    SelectSelectorConfig,
+    SelectSelectorMode,
 )
 
+from .message_schema import DEFAULT_AUTO_REPLY_PROMPT
 from .const import (
     DOMAIN,
     CONF_NAME,
@@ -26,6 +33,31 @@ from .const import (
     CONF_WEBHOOK_PATH,
     CONF_AUTO_REPLY,
     CONF_AGENT_ID,   
+    CONF_POOL_SIZE,
+    CONF_PUSH_COALESCE_WINDOW,
+    CONF_DISPATCH_WORKERS,
+    CONF_DISPATCH_QUEUE_SIZE,
+    CONF_PERSIST_WEBHOOK_DEDUP,
+    CONF_FAST_WEBHOOK_DECODER,
+    CONF_WEBHOOK_CONCURRENCY,
+    CONF_WEBHOOK_QUEUE_SIZE,
+    CONF_WEBHOOK_SHED_POLICY,
+    CONF_AUTO_REPLY_DEBOUNCE,
+    CONF_AUTO_REPLY_PROMPT,
+    CONF_AUTO_REPLY_SCHEMA_ONCE,
+    CONF_AUTO_REPLY_LOADING,
+    CONF_AUTO_REPLY_PARTIAL_AFTER,
+    CONF_AUTO_REPLY_PARTIAL_TEXT,
+    CONF_CONVERSATION_CACHE_SIZE,
+    LINE_API_POOL_SIZE,
+    DISPATCH_WORKERS,
+    DISPATCH_QUEUE_SIZE,
+    WEBHOOK_CONCURRENCY,
+    WEBHOOK_QUEUE_SIZE,
+    SHED_POLICY_DROP_NEWEST,
+    SHED_POLICY_DROP_OLDEST,
+    DEFAULT_AUTO_REPLY_PARTIAL_TEXT,
+    CONVERSATION_CACHE_SIZE,
 )
 
 
@@ -128,6 +160,40 @@ class LINEBotOptionsFlowHandler(config_entries.OptionsFlow):
     """處理選項變更."""
 
     BOOLEAN_SELECTOR = BooleanSelector(BooleanSelectorConfig())
+    PROMPT_SELECTOR = TextSelector(
+        TextSelectorConfig(type=TextSelectorType.TEXT, multiline=True)
+    )
+    POOL_SIZE_SELECTOR = NumberSelector(
+        NumberSelectorConfig(min=1, max=100, step=1, mode=NumberSelectorMode.BOX)
+    )
+    WORKERS_SELECTOR = NumberSelector(
+        NumberSelectorConfig(min=1, max=32, step=1, mode=NumberSelectorMode.BOX)
+    )
+    QUEUE_SIZE_SELECTOR = NumberSelector(
+        NumberSelectorConfig(min=1, max=10000, step=1, mode=NumberSelectorMode.BOX)
+    )
+    DEBOUNCE_SELECTOR = NumberSelector(
+        NumberSelectorConfig(
+            min=0, max=30, step=0.5, unit_of_measurement="s", mode=NumberSelectorMode.BOX
+        )
+    )
+    PARTIAL_AFTER_SELECTOR = NumberSelector(
+        NumberSelectorConfig(
+            min=0, max=25, step=0.5, unit_of_measurement="s", mode=NumberSelectorMode.BOX
+        )
+    )
+    SHED_POLICY_SELECTOR = SelectSelector(
+        SelectSelectorConfig(
+            options=[SHED_POLICY_DROP_NEWEST, SHED_POLICY_DROP_OLDEST],
+            translation_key=CONF_WEBHOOK_SHED_POLICY,
+            mode=SelectSelectorMode.DROPDOWN,
+        )
+    )
+    COALESCE_WINDOW_SELECTOR = NumberSelector(
+        NumberSelectorConfig(
+            min=0, max=1000, step=10, unit_of_measurement="ms", mode=NumberSelectorMode.BOX
+        )
+    )
 
     async def async_step_init(
         self, user_input: Optional[Dict[str, Any]] = None
@@ -146,6 +212,40 @@ class LINEBotOptionsFlowHandler(config_entries.OptionsFlow):
             ): TEXT_SELECTOR,
             vol.Optional(CONF_AUTO_REPLY, 
             default=old_options.get(CONF_AUTO_REPLY, False)): self.BOOLEAN_SELECTOR,
+            vol.Optional(CONF_AUTO_REPLY_DEBOUNCE,
+            default=old_options.get(CONF_AUTO_REPLY_DEBOUNCE, 0)): self.DEBOUNCE_SELECTOR,
+            vol.Optional(CONF_AUTO_REPLY_PROMPT,
+            default=old_options.get(CONF_AUTO_REPLY_PROMPT, DEFAULT_AUTO_REPLY_PROMPT)): self.PROMPT_SELECTOR,
+            vol.Optional(CONF_AUTO_REPLY_SCHEMA_ONCE,
+            default=old_options.get(CONF_AUTO_REPLY_SCHEMA_ONCE, False)): self.BOOLEAN_SELECTOR,
+            vol.Optional(CONF_AUTO_REPLY_LOADING,
+            default=old_options.get(CONF_AUTO_REPLY_LOADING, True)): self.BOOLEAN_SELECTOR,
+            vol.Optional(CONF_AUTO_REPLY_PARTIAL_AFTER,
+            default=old_options.get(CONF_AUTO_REPLY_PARTIAL_AFTER, 0)): self.PARTIAL_AFTER_SELECTOR,
+            vol.Optional(CONF_AUTO_REPLY_PARTIAL_TEXT,
+            default=old_options.get(
+                CONF_AUTO_REPLY_PARTIAL_TEXT, DEFAULT_AUTO_REPLY_PARTIAL_TEXT)): TEXT_SELECTOR,
+            vol.Optional(CONF_CONVERSATION_CACHE_SIZE,
+            default=old_options.get(
+                CONF_CONVERSATION_CACHE_SIZE, CONVERSATION_CACHE_SIZE)): self.QUEUE_SIZE_SELECTOR,
+            vol.Optional(CONF_POOL_SIZE,
+            default=old_options.get(CONF_POOL_SIZE, LINE_API_POOL_SIZE)): self.POOL_SIZE_SELECTOR,
+            vol.Optional(CONF_PUSH_COALESCE_WINDOW,
+            default=old_options.get(CONF_PUSH_COALESCE_WINDOW, 0)): self.COALESCE_WINDOW_SELECTOR,
+            vol.Optional(CONF_DISPATCH_WORKERS,
+            default=old_options.get(CONF_DISPATCH_WORKERS, DISPATCH_WORKERS)): self.WORKERS_SELECTOR,
+            vol.Optional(CONF_DISPATCH_QUEUE_SIZE,
+            default=old_options.get(CONF_DISPATCH_QUEUE_SIZE, DISPATCH_QUEUE_SIZE)): self.QUEUE_SIZE_SELECTOR,
+            vol.Optional(CONF_PERSIST_WEBHOOK_DEDUP,
+            default=old_options.get(CONF_PERSIST_WEBHOOK_DEDUP, False)): self.BOOLEAN_SELECTOR,
+            vol.Optional(CONF_FAST_WEBHOOK_DECODER,
+            default=old_options.get(CONF_FAST_WEBHOOK_DECODER, True)): self.BOOLEAN_SELECTOR,
+            vol.Optional(CONF_WEBHOOK_CONCURRENCY,
+            default=old_options.get(CONF_WEBHOOK_CONCURRENCY, WEBHOOK_CONCURRENCY)): self.WORKERS_SELECTOR,
+            vol.Optional(CONF_WEBHOOK_QUEUE_SIZE,
+            default=old_options.get(CONF_WEBHOOK_QUEUE_SIZE, WEBHOOK_QUEUE_SIZE)): self.QUEUE_SIZE_SELECTOR,
+            vol.Optional(CONF_WEBHOOK_SHED_POLICY,
+            default=old_options.get(CONF_WEBHOOK_SHED_POLICY, SHED_POLICY_DROP_NEWEST)): self.SHED_POLICY_SELECTOR,
         })
 
         return self.async_show_form(
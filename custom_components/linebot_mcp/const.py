@@ -14,6 +14,9 @@ SHUTDOWN_EVENT = "shutdown"
 # 全域服務名稱
 SERVICE_REPLY_MESSAGE = "linebot_reply_message"
 SERVICE_PUSH_MESSAGE = "linebot_push_message"
+SERVICE_MULTICAST_MESSAGE = "linebot_multicast_message"
+SERVICE_BROADCAST_MESSAGE = "linebot_broadcast_message"
+SERVICE_NARROWCAST_MESSAGE = "linebot_narrowcast_message"
 SERVICE_TEXT_CONTENT = "create_text_content"
 SERVICE_TEXT_V2_CONTENT = "create_text_v2_content"
 SERVICE_IMAGE_CONTENT = "create_image_content"
@@ -34,22 +37,56 @@ CONF_SECRET = "channel_secret"
 CONF_WEBHOOK_PATH = "webhook_path"
 CONF_AGENT_ID = "agent_id"
 CONF_AUTO_REPLY = "auto_reply"
+CONF_POOL_SIZE = "pool_size"
+CONF_PUSH_COALESCE_WINDOW = "push_coalesce_window"
+CONF_DISPATCH_WORKERS = "dispatch_workers"
+CONF_DISPATCH_QUEUE_SIZE = "dispatch_queue_size"
+CONF_PERSIST_WEBHOOK_DEDUP = "persist_webhook_dedup"
+CONF_FAST_WEBHOOK_DECODER = "fast_webhook_decoder"
+CONF_WEBHOOK_CONCURRENCY = "webhook_concurrency"
+CONF_WEBHOOK_QUEUE_SIZE = "webhook_queue_size"
+CONF_WEBHOOK_SHED_POLICY = "webhook_shed_policy"
+CONF_AUTO_REPLY_DEBOUNCE = "auto_reply_debounce"
+CONF_AUTO_REPLY_PROMPT = "auto_reply_prompt"
+CONF_AUTO_REPLY_SCHEMA_ONCE = "auto_reply_schema_once"
+CONF_AUTO_REPLY_LOADING = "auto_reply_loading"
+CONF_AUTO_REPLY_PARTIAL_AFTER = "auto_reply_partial_after"
+CONF_AUTO_REPLY_PARTIAL_TEXT = "auto_reply_partial_text"
+CONF_CONVERSATION_CACHE_SIZE = "conversation_cache_size"
+CONF_MCP_STREAM_BUFFER = "mcp_stream_buffer"
+CONF_MCP_BUFFER_POLICY = "mcp_buffer_policy"
+CONF_MCP_BUFFER_TIMEOUT = "mcp_buffer_timeout"
+CONF_MCP_TOOL_CONCURRENCY = "mcp_tool_concurrency"
+CONF_MCP_SESSION_TOOL_CONCURRENCY = "mcp_session_tool_concurrency"
 
 # LINE Bot
 LINE_API_CLIENT = "line_api_client"
+PUSH_COALESCER = "push_coalescer"
+MESSAGE_DISPATCHER = "message_dispatcher"
+WEBHOOK_DEDUP = "webhook_dedup"
+WEBHOOK_EXECUTOR = "webhook_executor"
+AUTO_REPLY_DEBOUNCER = "auto_reply_debouncer"
+CONVERSATION_CACHE = "conversation_cache"
 LINEBOT_INFO_COORDINATOR = "linebot_info_coordinator"
 LINEBOT_QUOTA_COORDINATOR = "linebot_quota_coordinator"
+QUOTA_LEDGER = "quota_ledger"
 DEVICE_MANUFACTURER = "LINE Corporation"
 DEVICE_MODEL = "LINE Bot with MCP"
 
 # 事件類型
 EVENT_MESSAGE_RECEIVED = f"linebot_{{}}_message_received"
 EVENT_POSTBACK = f"linebot_{{}}_postback"
+EVENT_MESSAGE_DISPATCHED = f"linebot_{{}}_message_dispatched"
 
 # LINE API 相關常數
 LINE_API_BASE_URL = "https://api.line.me"
 LINE_API_TIMEOUT = 30
 
+# LINE API 連線池設定
+LINE_API_POOL_SIZE = 20
+LINE_API_KEEPALIVE_TIMEOUT = 60
+LINE_API_DNS_CACHE_TTL = 300
+
 # LINE API 端點
 LINE_API_REPLY_ENDPOINT = "/v2/bot/message/reply"
 LINE_API_PUSH_ENDPOINT = "/v2/bot/message/push"
@@ -60,9 +97,102 @@ LINE_API_BOT_INFO_ENDPOINT = "/v2/bot/info"
 LINE_API_QUOTA_ENDPOINT = "/v2/bot/message/quota"
 LINE_API_QUOTA_CONSUMPTION_ENDPOINT = "/v2/bot/message/quota/consumption"
 LINE_API_PROFILE_ENDPOINT = "/v2/bot/profile"
+LINE_API_LOADING_ENDPOINT = "/v2/bot/chat/loading/start"
+
+# LINE API 速率限制 (每秒補充數, 突發容量)
+LINE_API_DEFAULT_RATE_LIMIT = (2000, 2000)
+LINE_API_RATE_LIMITS = {
+    LINE_API_REPLY_ENDPOINT: (2000, 2000),
+    LINE_API_PUSH_ENDPOINT: (2000, 2000),
+    LINE_API_MULTICAST_ENDPOINT: (200, 200),
+    LINE_API_BROADCAST_ENDPOINT: (60 / 3600, 60),
+    LINE_API_NARROWCAST_ENDPOINT: (60 / 3600, 60),
+    LINE_API_LOADING_ENDPOINT: (100, 100),
+}
+LINE_API_RATE_LIMIT_PAUSE = 1
+
+# LINE 載入動畫顯示秒數
+LINE_LOADING_SECONDS = 20
+
+# LINE multicast 單次最多收件者數
+LINE_MULTICAST_MAX_RECIPIENTS = 500
+
+# 外送訊息派送佇列設定
+DISPATCH_WORKERS = 4
+DISPATCH_QUEUE_SIZE = 100
+DISPATCH_ENQUEUE_TIMEOUT = 10
+DISPATCH_DRAIN_TIMEOUT = 10
+
+# 超過此大小（bytes）的 webhook 內容改在執行緒中解析
+WEBHOOK_PARSE_EXECUTOR_THRESHOLD = 8192
+
+# Webhook 事件處理設定
+WEBHOOK_CONCURRENCY = 4
+WEBHOOK_QUEUE_SIZE = 100
+SHED_POLICY_DROP_NEWEST = "drop_newest"
+SHED_POLICY_DROP_OLDEST = "drop_oldest"
+
+# 自動回覆訊息合併的最長等待時間（秒）
+AUTO_REPLY_DEBOUNCE_MAX_WAIT = 10
+
+# 自動回覆等待對話代理的最長時間（秒）
+AUTO_REPLY_TIMEOUT = 120
+DEFAULT_AUTO_REPLY_PARTIAL_TEXT = "思考中，請稍候…"
+
+# 自動回覆對話上下文快取設定
+# 對話代理保留對話的閒置時間（與 Home Assistant 相同），超過後視為新對話
+CONVERSATION_SESSION_TIMEOUT = 300
+CONVERSATION_CACHE_SIZE = 500
+CONVERSATION_CACHE_TTL = 86400
+CONVERSATION_MAX_TURNS = 3
+CONVERSATION_SUMMARY_LENGTH = 200
+
+# 訊息配額對帳設定（秒）
+# 有發送時使用最短的間隔，閒置時每次加倍直到上限
+QUOTA_RECONCILE_INTERVAL_ACTIVE = 1800
+QUOTA_RECONCILE_INTERVAL_IDLE = 7200
+# broadcast / narrowcast 後等待 LINE 計入用量再對帳
+QUOTA_UNKNOWN_RECONCILE_DELAY = 300
+LINE_QUOTA_TIMEZONE = "Asia/Tokyo"
+
+# 協調器更新設定（秒）
+BOT_INFO_REFRESH_INTERVAL = 86400
+# 更新失敗後的首次重試間隔，之後每次加倍直到正常間隔
+COORDINATOR_RETRY_INTERVAL = 60
+
+# Webhook 事件去重設定
+WEBHOOK_DEDUP_TTL = 86400
+WEBHOOK_DEDUP_MAX_EVENTS = 10000
+WEBHOOK_DEDUP_SAVE_DELAY = 10
+WEBHOOK_DEDUP_STORAGE_VERSION = 1
+
+# MCP 會話串流緩衝設定
+MCP_STREAM_BUFFER_SIZE = 32
+MCP_BUFFER_TIMEOUT = 5
+MCP_BUFFER_POLICY_BLOCK = "block"
+MCP_BUFFER_POLICY_REJECT = "reject"
+
+# MCP 工具調用並行上限（全部會話 / 單一會話）
+MCP_TOOL_CONCURRENCY = 16
+MCP_SESSION_TOOL_CONCURRENCY = 4
+
+# MCP Streamable HTTP 會話設定
+MCP_SESSION_IDLE_TIMEOUT = 600
+MCP_EVENT_BUFFER_SIZE = 100
+
+# Reply token 設定
+REPLY_TOKEN_LIFETIME = 30
+REPLY_TOKEN_SAFETY_MARGIN = 3
+REPLY_TOKEN_MAX_TRACKED = 1000
+
+# LINE API 重試設定
+LINE_API_MAX_RETRIES = 3
+LINE_API_RETRY_BACKOFF = 1
+LINE_API_RETRY_BACKOFF_MAX = 30
 
 # HTTP 標頭常數
 LINE_SIGNATURE = "X-Line-Signature"
+RETRY_KEY_HEADER = "X-Line-Retry-Key"
 CONTENT_TYPE_JSON = "application/json"
 HTTP_USER_AGENT = (
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
@@ -111,6 +241,9 @@ EVENT_MCP_TOOL_CALLED = f"linebot_mcp_tool_called"
 # MCP 工具名稱常數
 MCP_TOOL_PUSH_MESSAGE = f"push_message"
 MCP_TOOL_REPLY_MESSAGE = f"reply_message"
+MCP_TOOL_MULTICAST_MESSAGE = f"multicast_message"
+MCP_TOOL_BROADCAST_MESSAGE = f"broadcast_message"
+MCP_TOOL_NARROWCAST_MESSAGE = f"narrowcast_message"
 MCP_TOOL_GET_QUOTA_INFO = f"get_quota"
 
 # 錯誤訊息常數
@@ -141,6 +274,26 @@ PUSH_MESSAGE_SCHEMA = vol.Schema({
     **BASE_MESSAGE_FIELDS,
     vol.Required("to"): cv.string,
     vol.Optional("retry_key"): cv.string,
+    vol.Optional("wait", default=True): cv.boolean,
+})
+
+MULTICAST_MESSAGE_SCHEMA = vol.Schema({
+    **BASE_MESSAGE_FIELDS,
+    vol.Required("to"): vol.All(cv.ensure_list, vol.Length(min=1), [cv.string]),
+    vol.Optional("retry_key"): cv.string,
+})
+
+BROADCAST_MESSAGE_SCHEMA = vol.Schema({
+    **BASE_MESSAGE_FIELDS,
+    vol.Optional("retry_key"): cv.string,
+})
+
+NARROWCAST_MESSAGE_SCHEMA = vol.Schema({
+    **BASE_MESSAGE_FIELDS,
+    vol.Optional("recipient"): dict,
+    vol.Optional("filter"): dict,
+    vol.Optional("limit"): dict,
+    vol.Optional("retry_key"): cv.string,
 })
 
 CREATE_TEXT_SCHEMA = vol.Schema({
@@ -281,5 +434,159 @@ PUSH_MESSAGE_DESCRIBE = {
                 "boolean": False
             }
         },
+        "wait": {
+            "description": "Wait until LINE accepts the message. When disabled, the message is queued and a job ID is returned",
+            "example": True,
+            "required": False,
+            "selector": {
+                "boolean": True
+            }
+        },
+    },
+}
+MULTICAST_MESSAGE_DESCRIBE = {
+    "name": "Multicast LINE message",
+    "description": "Send the same messages to multiple LINE users",
+    "fields": {
+        "name": {
+            "description": "LINE Bot ID",
+            "example": "@linebot",
+            "required": True,
+            "selector": {
+                "text": ""
+            }
+        },
+        "to": {
+            "description": "List of user IDs to send messages to (split into batches of 500 automatically)",
+            "example": '["U1234567890abcdef1234567890abcdef", "U0987654321fedcba0987654321fedcba"]',
+            "required": True,
+            "selector": {
+                "object": {}
+            }
+        },
+        "messages": {
+            "description": "Array of message objects to send",
+            "example": '[{"type": "text", "text": "Hello World!"}]',
+            "required": True,
+            "selector": {
+                "object": {}
+            }
+        },
+        "retry_key": {
+            "description": "Retry key for idempotency (UUID format recommended)",
+            "example": "550e8400-e29b-41d4-a716-446655440000",
+            "required": False,
+            "selector": {
+                "text": ""
+            }
+        },
+        "notification_disabled": {
+            "description": "Disable push notification for this message",
+            "example": False,
+            "required": False,
+            "selector": {
+                "boolean": False
+            }
+        },
+    },
+}
+BROADCAST_MESSAGE_DESCRIBE = {
+    "name": "Broadcast LINE message",
+    "description": "Send messages to all users who have added the LINE Bot as a friend",
+    "fields": {
+        "name": {
+            "description": "LINE Bot ID",
+            "example": "@linebot",
+            "required": True,
+            "selector": {
+                "text": ""
+            }
+        },
+        "messages": {
+            "description": "Array of message objects to send",
+            "example": '[{"type": "text", "text": "Hello World!"}]',
+            "required": True,
+            "selector": {
+                "object": {}
+            }
+        },
+        "retry_key": {
+            "description": "Retry key for idempotency (UUID format recommended)",
+            "example": "550e8400-e29b-41d4-a716-446655440000",
+            "required": False,
+            "selector": {
+                "text": ""
+            }
+        },
+        "notification_disabled": {
+            "description": "Disable push notification for this message",
+            "example": False,
+            "required": False,
+            "selector": {
+                "boolean": False
+            }
+        },
     },
-}
\ No newline at end of file
+}
+NARROWCAST_MESSAGE_DESCRIBE = {
+    "name": "Narrowcast LINE message",
+    "description": "Send messages to users selected by audience or demographic filter",
+    "fields": {
+        "name": {
+            "description": "LINE Bot ID",
+            "example": "@linebot",
+            "required": True,
+            "selector": {
+                "text": ""
+            }
+        },
+        "messages": {
+            "description": "Array of message objects to send",
+            "example": '[{"type": "text", "text": "Hello World!"}]',
+            "required": True,
+            "selector": {
+                "object": {}
+            }
+        },
+        "recipient": {
+            "description": "Recipient object (audience or redelivery)",
+            "example": '{"type": "audience", "audienceGroupId": 5614991017776}',
+            "required": False,
+            "selector": {
+                "object": {}
+            }
+        },
+        "filter": {
+            "description": "Demographic filter object",
+            "example": '{"demographic": {"type": "gender", "oneOf": ["male"]}}',
+            "required": False,
+            "selector": {
+                "object": {}
+            }
+        },
+        "limit": {
+            "description": "Limit object for the maximum number of recipients",
+            "example": '{"max": 100}',
+            "required": False,
+            "selector": {
+                "object": {}
+            }
+        },
+        "retry_key": {
+            "description": "Retry key for idempotency (UUID format recommended)",
+            "example": "550e8400-e29b-41d4-a716-446655440000",
+            "required": False,
+            "selector": {
+                "text": ""
+            }
+        },
+        "notification_disabled": {
+            "description": "Disable push notification for this message",
+            "example": False,
+            "required": False,
+            "selector": {
+                "boolean": False
+            }
+        },
+    },
+}
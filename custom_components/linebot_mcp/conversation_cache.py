@@ -0,0 +1,125 @@
+"""自動回覆的對話上下文快取."""
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .const import (
+    CONVERSATION_CACHE_SIZE,
+    CONVERSATION_CACHE_TTL,
+    CONVERSATION_MAX_TURNS,
+    CONVERSATION_SUMMARY_LENGTH,
+    CONVERSATION_SESSION_TIMEOUT,
+)
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _summarize(text: str) -> str:
+    """截斷為摘要長度"""
+    text = " ".join(text.split())
+    if len(text) <= CONVERSATION_SUMMARY_LENGTH:
+        return text
+    return text[:CONVERSATION_SUMMARY_LENGTH - 1] + "…"
+
+
+@dataclass(slots=True)
+class ConversationContext:
+    """單一 LINE 來源（用戶、群組或聊天室）的對話上下文."""
+
+    conversation_id: Optional[str] = None
+    schema_sent: bool = False
+    last_used: float = 0.0
+    turns: deque[tuple[str, str]] = field(
+        default_factory=lambda: deque(maxlen=CONVERSATION_MAX_TURNS)
+    )
+
+    @property
+    def session_expired(self) -> bool:
+        """對話代理是否已不保留先前的對話"""
+        return (
+            self.conversation_id is None
+            or time.monotonic() - self.last_used > CONVERSATION_SESSION_TIMEOUT
+        )
+
+    def touch(self) -> None:
+        """更新最後使用時間."""
+        self.last_used = time.monotonic()
+
+    def add_turn(self, user_text: str, reply_text: str) -> None:
+        """記錄一輪對話摘要."""
+        self.turns.append((_summarize(user_text), _summarize(reply_text)))
+
+    def history_prompt(self) -> str:
+        """近期對話摘要（開啟新對話時附在 prompt 中）"""
+        return "\n".join(
+            f"User: {user_text}\nAssistant: {reply_text}"
+            for user_text, reply_text in self.turns
+        )
+
+
+class ConversationCache:
+    """以 (來源類型, 來源 ID) 對應對話上下文的 LRU/TTL 快取.
+
+    群組與聊天室各自擁有獨立的對話，不再與成員的一對一對話共用；
+    條目數量有上限，超過時淘汰最久未使用的條目。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CONVERSATION_CACHE_SIZE,
+        ttl: float = CONVERSATION_CACHE_TTL,
+    ) -> None:
+        """初始化快取."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple[str, str], ConversationContext] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """快取統計"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    def get(self, source_type: str, source_id: str) -> ConversationContext:
+        """取得來源的對話上下文，不存在時建立."""
+        now = time.monotonic()
+        self._prune(now)
+
+        key = (source_type, source_id)
+        if (context := self._entries.get(key)) is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        else:
+            self.misses += 1
+            context = self._entries[key] = ConversationContext(last_used=now)
+            if len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.evicted += 1
+                _LOGGER.debug(f"Evicted conversation context {evicted}: {self.stats}")
+        return context
+
+    def _prune(self, now: float) -> None:
+        """移除超過 TTL 的條目（依最後使用時間排序）."""
+        while self._entries:
+            key, context = next(iter(self._entries.items()))
+            if now - context.last_used <= self.ttl:
+                break
+            self._entries.pop(key)
+            self.expired += 1
@@ -3,12 +3,14 @@ from __future__ import annotations
 
 import asyncio
 import logging
+from abc import abstractmethod
 from datetime import timedelta
 from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers.event import async_call_later, async_track_point_in_time
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
     UpdateFailed,
@@ -19,14 +21,25 @@ from .const import (
     CONF_NAME,
     CONF_WEBHOOK_PATH,
     LINE_API_CLIENT,
+    BOT_INFO_REFRESH_INTERVAL,
+    COORDINATOR_RETRY_INTERVAL,
+    QUOTA_LEDGER,
+    QUOTA_RECONCILE_INTERVAL_ACTIVE,
+    QUOTA_RECONCILE_INTERVAL_IDLE,
+    QUOTA_UNKNOWN_RECONCILE_DELAY,
 )
 from .line_api_client import LineApiClient, LineApiError
+from .quota import QuotaLedger, next_period_start
 
 _LOGGER = logging.getLogger(__name__)
 
 
 class BaseBotCoordinator(DataUpdateCoordinator):
-    """LINE Bot 基礎協調器."""
+    """LINE Bot 基礎協調器.
+
+    更新失敗時從 COORDINATOR_RETRY_INTERVAL 開始以指數退避重試，
+    成功後由子類別決定下一次的更新間隔。
+    """
 
     def __init__(
         self,
@@ -44,7 +57,8 @@ class BaseBotCoordinator(DataUpdateCoordinator):
         )
         self.hass = hass
         self.config_entry = config_entry
-    
+        self._failures = 0
+
     @property
     def config_data(self) -> dict[str, Any]:
         """取得配置資料."""
@@ -65,6 +79,34 @@ class BaseBotCoordinator(DataUpdateCoordinator):
         """檢查是否有數據"""
         return self.data is not None
 
+    def _interval_after_success(self) -> timedelta:
+        """更新成功後的間隔."""
+        return self.update_interval
+
+    def _max_interval(self) -> timedelta:
+        """失敗重試間隔的上限."""
+        return self._interval_after_success()
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        """更新資料並依結果調整下一次的更新間隔."""
+        try:
+            data = await self._async_fetch_data()
+        except Exception:
+            self._failures += 1
+            self.update_interval = min(
+                timedelta(seconds=COORDINATOR_RETRY_INTERVAL * 2 ** (self._failures - 1)),
+                self._max_interval(),
+            )
+            raise
+
+        self._failures = 0
+        self.update_interval = self._interval_after_success()
+        return data
+
+    @abstractmethod
+    async def _async_fetch_data(self) -> dict[str, Any]:
+        """從 LINE API 取得資料."""
+
     def _handle_api_error(self, err: Exception) -> None:
         """處理 API 錯誤."""
         if isinstance(err, LineApiError):
@@ -74,7 +116,10 @@ class BaseBotCoordinator(DataUpdateCoordinator):
 
 
 class LineBotInfoCoordinator(BaseBotCoordinator):
-    """LINE Bot 資訊更新協調器."""
+    """LINE Bot 資訊更新協調器.
+
+    Bot 資訊很少變動，每天更新一次；需要時可由 homeassistant.update_entity 立即更新。
+    """
 
     def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
         """初始化協調器."""
@@ -82,10 +127,14 @@ class LineBotInfoCoordinator(BaseBotCoordinator):
             hass,
             config_entry,
             "Bot Info",
-            timedelta(minutes=10),
+            timedelta(seconds=BOT_INFO_REFRESH_INTERVAL),
         )
 
-    async def _async_update_data(self) -> dict[str, Any]:
+    def _interval_after_success(self) -> timedelta:
+        """更新成功後的間隔."""
+        return timedelta(seconds=BOT_INFO_REFRESH_INTERVAL)
+
+    async def _async_fetch_data(self) -> dict[str, Any]:
         """從 LINE API 獲取 Bot 資訊."""
         try:
             response = await self.line_api_client.get_bot_info()
@@ -107,7 +156,12 @@ class LineBotInfoCoordinator(BaseBotCoordinator):
 
 
 class LineBotQuotaCoordinator(BaseBotCoordinator):
-    """LINE Bot 配額更新協調器."""
+    """LINE Bot 配額更新協調器.
+
+    用量由本地帳本即時累計，只定期向 LINE 對帳：有發送時最遲在
+    QUOTA_RECONCILE_INTERVAL_ACTIVE 內對帳，閒置時間隔每次加倍直到
+    QUOTA_RECONCILE_INTERVAL_IDLE；broadcast / narrowcast 等無法在本地計算的發送後提前對帳。
+    """
 
     def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
         """初始化協調器."""
@@ -115,11 +169,114 @@ class LineBotQuotaCoordinator(BaseBotCoordinator):
             hass,
             config_entry,
             "Message Quota",
-            timedelta(minutes=1),
+            timedelta(seconds=QUOTA_RECONCILE_INTERVAL_ACTIVE),
+        )
+        self._success_interval = timedelta(seconds=QUOTA_RECONCILE_INTERVAL_ACTIVE)
+        # 下一次定期對帳與額外排程對帳的時間（event loop 時間）
+        self._next_refresh: float | None = None
+        self._reconcile_due: float | None = None
+        self._unsub_reconcile: CALLBACK_TYPE | None = None
+        self._unsub_rollover: CALLBACK_TYPE | None = None
+        config_entry.async_on_unload(self.ledger.add_listener(self._handle_usage))
+        config_entry.async_on_unload(self._cancel_reconcile)
+        config_entry.async_on_unload(self._cancel_rollover)
+        self._schedule_rollover()
+
+    @property
+    def ledger(self) -> QuotaLedger:
+        """取得配額帳本."""
+        return self.config_data[QUOTA_LEDGER]
+
+    def _ledger_data(self) -> dict[str, Any]:
+        """以帳本估計值組成感測器資料."""
+        return {
+            "type": self.ledger.limit_type,
+            "value": self.ledger.limit,
+            "total_usage": self.ledger.usage,
+        }
+
+    @callback
+    def _handle_usage(self) -> None:
+        """發送成功後更新用量，必要時提前對帳."""
+        # 不經由 async_set_updated_data，以免每次發送都延後下一次對帳
+        if self.data is not None:
+            self.data = self._ledger_data()
+            self.async_update_listeners()
+        if not self.ledger.active:
+            return
+        self._schedule_reconcile(
+            QUOTA_UNKNOWN_RECONCILE_DELAY
+            if self.ledger.needs_reconcile
+            else QUOTA_RECONCILE_INTERVAL_ACTIVE
         )
 
+    @callback
+    def _schedule_reconcile(self, delay: float) -> None:
+        """在 delay 秒內對帳（已有更早的對帳時不重複排程）."""
+        due = self.hass.loop.time() + delay
+        if self._reconcile_due is not None and self._reconcile_due <= due:
+            return
+        if self._next_refresh is not None and self._next_refresh <= due:
+            return
+        self._cancel_reconcile()
+        self._reconcile_due = due
+        self._unsub_reconcile = async_call_later(self.hass, delay, self._scheduled_reconcile)
+
+    async def _scheduled_reconcile(self, _now: Any) -> None:
+        """執行排程的對帳."""
+        self._unsub_reconcile = None
+        self._reconcile_due = None
+        await self.async_request_refresh()
+
+    @callback
+    def _cancel_reconcile(self) -> None:
+        """取消尚未執行的對帳."""
+        if self._unsub_reconcile is not None:
+            self._unsub_reconcile()
+            self._unsub_reconcile = None
+        self._reconcile_due = None
+
+    @callback
+    def _schedule_rollover(self) -> None:
+        """排程在下一個配額月份開始時重置用量."""
+        # 稍微延後，確保觸發時已進入新的月份
+        self._unsub_rollover = async_track_point_in_time(
+            self.hass, self._handle_rollover, next_period_start() + timedelta(seconds=1)
+        )
+
+    @callback
+    def _handle_rollover(self, _now: Any) -> None:
+        """配額月份開始：重置用量（延後的 broadcast 隨之恢復）並排程下一次."""
+        self.ledger.roll_over()
+        self._schedule_rollover()
+
+    @callback
+    def _cancel_rollover(self) -> None:
+        """取消月份重置排程."""
+        if self._unsub_rollover is not None:
+            self._unsub_rollover()
+            self._unsub_rollover = None
+
+    def _interval_after_success(self) -> timedelta:
+        """對帳成功後的間隔."""
+        return self._success_interval
+
+    def _max_interval(self) -> timedelta:
+        """失敗重試間隔的上限."""
+        return timedelta(seconds=QUOTA_RECONCILE_INTERVAL_IDLE)
+
     async def _async_update_data(self) -> dict[str, Any]:
-        """從 LINE API 獲取訊息配額資訊."""
+        """對帳並記錄下一次定期對帳的時間."""
+        try:
+            return await super()._async_update_data()
+        finally:
+            self._next_refresh = self.hass.loop.time() + self.update_interval.total_seconds()
+
+    async def _async_fetch_data(self) -> dict[str, Any]:
+        """從 LINE API 獲取訊息配額資訊並與本地帳本對帳."""
+        # 查詢期間的發送不一定已計入 LINE 回報的用量，先記下目前的本地用量
+        counted = self.ledger.local_usage
+        active = self.ledger.active
         try:
             quota_task = self.line_api_client.get_message_quota()
             consumption_task = self.line_api_client.get_message_quota_consumption()
@@ -131,11 +288,19 @@ class LineBotQuotaCoordinator(BaseBotCoordinator):
             quota_info = quota_response.data
             consumption_info = consumption_response.data
 
-            return {
-                "type": quota_info.get("type"),
-                "value": quota_info.get("value"),
-                "total_usage": consumption_info.get("totalUsage"),
-            }
-
         except Exception as err:
-            self._handle_api_error(err)
\ No newline at end of file
+            self._handle_api_error(err)
+
+        self.ledger.reconcile(
+            quota_info.get("type"),
+            quota_info.get("value"),
+            consumption_info.get("totalUsage"),
+            counted,
+        )
+        self._cancel_reconcile()
+        # 上一段期間有發送時使用最短間隔，否則逐次加倍
+        if active:
+            self._success_interval = timedelta(seconds=QUOTA_RECONCILE_INTERVAL_ACTIVE)
+        else:
+            self._success_interval = min(self._success_interval * 2, self._max_interval())
+        return self._ledger_data()
\ No newline at end of file
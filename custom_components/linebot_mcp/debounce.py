@@ -0,0 +1,109 @@
+"""自動回覆的對話訊息合併."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from functools import partial
+from typing import TYPE_CHECKING, Optional
+
+from homeassistant.core import HomeAssistant
+
+from .const import AUTO_REPLY_DEBOUNCE_MAX_WAIT
+
+if TYPE_CHECKING:
+    from .webhook_executor import WebhookEventExecutor
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# (合併後的文字, reply token, 來源類型, 對話鍵值（來源 ID）)
+AutoReplyHandler = Callable[[str, Optional[str], str, str], Awaitable[None]]
+
+
+@dataclass(slots=True)
+class _PendingTurn:
+    """等待合併的對話內容."""
+
+    source_type: str
+    handler: AutoReplyHandler
+    started: float
+    texts: list[str] = field(default_factory=list)
+    reply_token: Optional[str] = None
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class AutoReplyDebouncer:
+    """將同一對話在短時間內連續傳送的文字訊息合併為一次自動回覆.
+
+    每收到一則訊息就重新計時，窗口結束後以最新的 reply token 回覆；
+    持續有訊息時最多等待 AUTO_REPLY_DEBOUNCE_MAX_WAIT 秒。
+    合併後的回覆交由 webhook 執行器處理，維持同一對話的處理順序。
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        executor: WebhookEventExecutor,
+        window: float,
+        max_wait: float = AUTO_REPLY_DEBOUNCE_MAX_WAIT,
+    ) -> None:
+        """初始化.
+
+        :param window: 合併窗口（秒）
+        """
+        self.hass = hass
+        self.executor = executor
+        self.window = window
+        self.max_wait = max_wait
+        self._pending: dict[str, _PendingTurn] = {}
+
+    def submit(
+        self,
+        key: str,
+        text: str,
+        reply_token: Optional[str],
+        source_type: str,
+        handler: AutoReplyHandler,
+    ) -> None:
+        """加入訊息並重新計時."""
+        now = time.monotonic()
+        if (turn := self._pending.get(key)) is None:
+            turn = self._pending[key] = _PendingTurn(source_type, handler, now)
+
+        turn.texts.append(text)
+        turn.reply_token = reply_token or turn.reply_token
+
+        if turn.timer is not None:
+            turn.timer.cancel()
+        delay = max(0.0, min(self.window, turn.started + self.max_wait - now))
+        turn.timer = self.hass.loop.call_later(delay, self._flush, key)
+
+    def _flush(self, key: str) -> None:
+        """送出合併後的訊息."""
+        if (turn := self._pending.pop(key, None)) is None:
+            return
+
+        if len(turn.texts) > 1:
+            _LOGGER.debug(f"Merged {len(turn.texts)} message(s) from {key} into one auto reply")
+
+        self.executor.submit(
+            key,
+            partial(
+                turn.handler,
+                "\n".join(turn.texts),
+                turn.reply_token,
+                turn.source_type,
+                key,
+            ),
+            "auto reply",
+        )
+
+    def close(self) -> None:
+        """取消所有等待中的合併."""
+        for turn in self._pending.values():
+            if turn.timer is not None:
+                turn.timer.cancel()
+        self._pending.clear()
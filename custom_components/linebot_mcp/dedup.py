@@ -0,0 +1,106 @@
+"""Webhook 事件去重."""
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    WEBHOOK_DEDUP_TTL,
+    WEBHOOK_DEDUP_MAX_EVENTS,
+    WEBHOOK_DEDUP_SAVE_DELAY,
+    WEBHOOK_DEDUP_STORAGE_VERSION,
+)
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class WebhookEventDeduplicator:
+    """以 webhookEventId 過濾 LINE 重送的 webhook 事件.
+
+    事件被執行器接受後才記錄 ID，被丟棄的事件可由 LINE 重送後再處理；
+    已記錄的事件 ID 保留 TTL 時間並限制數量；啟用持久化時，
+    重新啟動後仍可辨識重啟前已處理的事件。
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        persist: bool = False,
+        ttl: float = WEBHOOK_DEDUP_TTL,
+        max_events: int = WEBHOOK_DEDUP_MAX_EVENTS,
+    ) -> None:
+        """初始化去重索引."""
+        self.ttl = ttl
+        self.max_events = max_events
+        # 事件 ID -> 到期時間（依加入順序排列）
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._store: Optional[Store] = (
+            Store(hass, WEBHOOK_DEDUP_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.webhook_events")
+            if persist else None
+        )
+
+    async def async_load(self) -> None:
+        """載入持久化的事件 ID."""
+        if self._store is None:
+            return
+
+        data = await self._store.async_load() or {}
+        now = time.time()
+        for event_id, expires in sorted(data.get("events", {}).items(), key=lambda x: x[1]):
+            if expires > now:
+                self._seen[event_id] = expires
+        self._prune(now)
+        _LOGGER.debug(f"Restored {len(self._seen)} webhook event id(s)")
+
+    async def async_save(self) -> None:
+        """立即寫入持久化資料."""
+        if self._store is not None:
+            await self._store.async_save(self._data_to_save())
+
+    def _data_to_save(self) -> Dict[str, Any]:
+        """持久化資料"""
+        return {"events": dict(self._seen)}
+
+    def is_duplicate(self, event_id: Optional[str]) -> bool:
+        """檢查事件是否已處理."""
+        if not event_id:
+            return False
+
+        self._prune(time.time())
+        return event_id in self._seen
+
+    def record(self, event_id: Optional[str]) -> None:
+        """記錄已接受處理的事件."""
+        if not event_id:
+            return
+
+        now = time.time()
+        self._prune(now)
+        self._seen[event_id] = now + self.ttl
+        self._schedule_save()
+
+    def forget(self, event_id: Optional[str]) -> None:
+        """移除未處理就被丟棄的事件，讓 LINE 重送時可再處理."""
+        if event_id and self._seen.pop(event_id, None) is not None:
+            self._schedule_save()
+
+    def _schedule_save(self) -> None:
+        """延遲寫入持久化資料."""
+        if self._store is not None:
+            self._store.async_delay_save(self._data_to_save, WEBHOOK_DEDUP_SAVE_DELAY)
+
+    def _prune(self, now: float) -> None:
+        """移除過期或超出上限的事件 ID."""
+        while self._seen:
+            event_id, expires = next(iter(self._seen.items()))
+            if expires > now and len(self._seen) < self.max_events:
+                break
+            self._seen.pop(event_id)
@@ -0,0 +1,358 @@
+"""LINE Bot 外送訊息派送佇列."""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import math
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import ulid as ulid_util
+
+from .line_api_client import LineApiClient, LineApiError, LineApiResponse, QuotaExceededError
+from .reply_token import ReplyTokenInfo, ReplyTokenTracker
+from .const import (
+    REPLY_TOKEN_SAFETY_MARGIN,
+    DISPATCH_WORKERS,
+    DISPATCH_QUEUE_SIZE,
+    DISPATCH_ENQUEUE_TIMEOUT,
+    DISPATCH_DRAIN_TIMEOUT,
+    EVENT_MESSAGE_DISPATCHED,
+)
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# 派送優先順序（數字越小越優先）；reply token 僅約 30 秒有效，因此最優先
+PRIORITY_REPLY = 0
+PRIORITY_PUSH = 1
+PRIORITY_BROADCAST = 2
+
+
+class DispatchQueueFullError(HomeAssistantError):
+    """派送佇列已滿."""
+
+
+class MessageDeferredError(HomeAssistantError):
+    """本月配額不足，工作已延後至配額恢復後發送."""
+
+    def __init__(self, message: str, job_id: str) -> None:
+        super().__init__(message)
+        self.job_id = job_id
+
+
+@dataclass(order=True)
+class _Job:
+    """派送工作."""
+
+    sort_key: tuple
+    job_id: str = field(compare=False)
+    description: str = field(compare=False)
+    factory: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    # 工作因配額不足而延後時完成
+    deferred: asyncio.Future = field(compare=False)
+
+
+class MessageDispatcher:
+    """每個 Bot 的有界外送佇列與 worker pool.
+
+    呼叫端只需等待佇列位置，LINE API 的延遲由 worker 承擔；
+    佇列滿時等待至逾時後拒絕，避免無限制堆積。
+    同為 reply 的工作依 reply token 到期時間先到先送（EDF）。
+    配額不足而無法送出的 broadcast / narrowcast 暫存起來，配額恢復後重新排入佇列。
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        botname: str,
+        client: LineApiClient,
+        workers: int = DISPATCH_WORKERS,
+        max_queue_size: int = DISPATCH_QUEUE_SIZE,
+        enqueue_timeout: float = DISPATCH_ENQUEUE_TIMEOUT,
+    ) -> None:
+        """初始化派送佇列."""
+        self.hass = hass
+        self.botname = botname
+        self.client = client
+        self.reply_tokens = ReplyTokenTracker()
+        self.workers = workers
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: asyncio.PriorityQueue[_Job] = asyncio.PriorityQueue(max_queue_size)
+        self._sequence = itertools.count()
+        self._worker_tasks: list[asyncio.Task] = []
+        self._active = 0
+        self._deferred: list[_Job] = []
+
+    @property
+    def queue_size(self) -> int:
+        """佇列中等待的工作數"""
+        return self._queue.qsize()
+
+    @property
+    def active_jobs(self) -> int:
+        """正在執行的工作數"""
+        return self._active
+
+    @property
+    def deferred_jobs(self) -> int:
+        """因配額不足而延後的工作數"""
+        return len(self._deferred)
+
+    def start(self, entry: ConfigEntry) -> None:
+        """啟動 worker."""
+        for index in range(self.workers):
+            self._worker_tasks.append(
+                entry.async_create_background_task(
+                    self.hass,
+                    self._worker(),
+                    f"{self.botname}: message dispatcher {index}",
+                )
+            )
+        if (ledger := self.client.quota_ledger) is not None:
+            entry.async_on_unload(ledger.add_listener(self._resume_deferred))
+
+    async def stop(self) -> None:
+        """等待佇列清空後停止 worker，逾時則取消剩餘工作."""
+        try:
+            async with asyncio.timeout(DISPATCH_DRAIN_TIMEOUT):
+                await self._queue.join()
+        except TimeoutError:
+            _LOGGER.warning(
+                f"{self.botname}: dropping {self._queue.qsize()} queued message(s) on shutdown"
+            )
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks.clear()
+
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            job.future.cancel()
+            self._queue.task_done()
+
+        if self._deferred:
+            _LOGGER.warning(
+                f"{self.botname}: dropping {len(self._deferred)} deferred message(s) on shutdown"
+            )
+        for job in self._deferred:
+            job.future.cancel()
+        self._deferred.clear()
+
+    async def _put(
+        self,
+        priority: int,
+        factory: Callable[[], Awaitable[Any]],
+        description: str,
+        deadline: Optional[float] = None,
+    ) -> _Job:
+        """將工作放入佇列（背壓：佇列滿時等待至逾時）."""
+        job = _Job(
+            sort_key=(
+                priority,
+                math.inf if deadline is None else deadline,
+                next(self._sequence),
+            ),
+            job_id=ulid_util.ulid_now(),
+            description=description,
+            factory=factory,
+            future=self.hass.loop.create_future(),
+            deferred=self.hass.loop.create_future(),
+        )
+        try:
+            async with asyncio.timeout(self.enqueue_timeout):
+                await self._queue.put(job)
+        except TimeoutError as err:
+            raise DispatchQueueFullError(
+                f"{self.botname}: message queue is full ({self._queue.maxsize} pending)"
+            ) from err
+        return job
+
+    async def run(
+        self,
+        priority: int,
+        factory: Callable[[], Awaitable[Any]],
+        description: str = "message",
+        deadline: Optional[float] = None,
+    ) -> Any:
+        """排入佇列並等待結果.
+
+        工作因配額不足而延後時引發 MessageDeferredError，完成後另以事件回報。
+        """
+        job = await self._put(priority, factory, description, deadline)
+        try:
+            await asyncio.wait((job.future, job.deferred), return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+
+        if job.future.done():
+            return job.future.result()
+
+        self.track(job.future, description, job.job_id)
+        raise MessageDeferredError(
+            f"{self.botname}: monthly quota exhausted, {description} deferred as job {job.job_id}",
+            job.job_id,
+        )
+
+    async def reply(
+        self,
+        reply_token: str,
+        messages: List[Dict[str, Any]],
+        notification_disabled: bool = False,
+    ) -> LineApiResponse:
+        """依 reply token 到期時間排程回覆.
+
+        token 已過期或即將過期時，改以 push 發送給原始來源。
+        """
+        info = self.reply_tokens.get(reply_token)
+
+        async def _send() -> LineApiResponse:
+            try:
+                if info and info.target and info.remaining < REPLY_TOKEN_SAFETY_MARGIN:
+                    return await self._fallback_push(info, messages, notification_disabled)
+                try:
+                    return await self.client.reply_message(
+                        reply_token=reply_token,
+                        messages=messages,
+                        notification_disabled=notification_disabled,
+                    )
+                except LineApiError as err:
+                    if (
+                        info and info.target
+                        and err.status_code == 400
+                        and "reply token" in str(err).lower()
+                    ):
+                        return await self._fallback_push(info, messages, notification_disabled)
+                    raise
+            finally:
+                self.reply_tokens.consume(reply_token)
+
+        return await self.run(
+            PRIORITY_REPLY,
+            _send,
+            "reply",
+            deadline=info.deadline if info else None,
+        )
+
+    async def _fallback_push(
+        self,
+        info: ReplyTokenInfo,
+        messages: List[Dict[str, Any]],
+        notification_disabled: bool,
+    ) -> LineApiResponse:
+        """reply token 失效時改用 push 發送."""
+        _LOGGER.info(
+            f"{self.botname}: reply token expired or about to expire, "
+            f"falling back to push to {info.target}"
+        )
+        return await self.client.push_message(
+            to=info.target,
+            messages=messages,
+            notification_disabled=notification_disabled,
+        )
+
+    async def enqueue(
+        self,
+        priority: int,
+        factory: Callable[[], Awaitable[Any]],
+        description: str = "message",
+    ) -> str:
+        """排入佇列後立即回傳工作 ID."""
+        job = await self._put(priority, factory, description)
+        return self.track(job.future, description, job.job_id)
+
+    def track(
+        self,
+        future: asyncio.Future,
+        description: str = "message",
+        job_id: Optional[str] = None,
+    ) -> str:
+        """追蹤不需等待的工作，完成時觸發事件."""
+        job_id = job_id or ulid_util.ulid_now()
+        future.add_done_callback(partial(self._job_done, job_id, description))
+        return job_id
+
+    def _defer(self, job: _Job, err: QuotaExceededError) -> None:
+        """暫存配額不足的工作."""
+        _LOGGER.warning(f"{self.botname}: {job.description} {job.job_id} deferred: {err}")
+        self._deferred.append(job)
+        if not job.deferred.done():
+            job.deferred.set_result(None)
+
+    def _resume_deferred(self) -> None:
+        """配額恢復後將延後的工作重新排入佇列."""
+        if not self._deferred or not self.client.quota_ledger.admit(None):
+            return
+
+        while self._deferred:
+            job = self._deferred[0]
+            if not job.future.done():
+                try:
+                    self._queue.put_nowait(job)
+                except asyncio.QueueFull:
+                    # 佇列滿時留待下次用量變更再排入
+                    return
+                _LOGGER.info(f"{self.botname}: resuming deferred {job.description} {job.job_id}")
+            self._deferred.pop(0)
+
+    def _job_done(self, job_id: str, description: str, future: asyncio.Future) -> None:
+        """回報背景工作結果."""
+        if future.cancelled():
+            error = "cancelled"
+        elif (exc := future.exception()) is not None:
+            error = str(exc)
+        else:
+            error = None
+
+        if error:
+            _LOGGER.error(f"{self.botname}: queued {description} {job_id} failed: {error}")
+
+        self.hass.bus.async_fire(
+            EVENT_MESSAGE_DISPATCHED.format(self.botname),
+            {
+                "job_id": job_id,
+                "description": description,
+                "success": error is None,
+                "error": error,
+            },
+        )
+
+    async def _worker(self) -> None:
+        """處理佇列中的工作."""
+        while True:
+            job = await self._queue.get()
+            try:
+                # 呼叫端已取消的工作直接略過
+                if job.future.done():
+                    continue
+
+                self._active += 1
+                try:
+                    result = await job.factory()
+                except asyncio.CancelledError:
+                    job.future.cancel()
+                    raise
+                except QuotaExceededError as e:
+                    if e.deferrable:
+                        self._defer(job, e)
+                    elif not job.future.done():
+                        job.future.set_exception(e)
+                except Exception as e:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                else:
+                    if not job.future.done():
+                        job.future.set_result(result)
+                finally:
+                    self._active -= 1
+            finally:
+                self._queue.task_done()
@@ -1,19 +1,30 @@
-"""LINE Messaging API Client using Home Assistant aiohttp client."""
+"""LINE Messaging API Client using a dedicated aiohttp connection pool."""
 from __future__ import annotations
 
 import asyncio
 import json
 import logging
+import random
+import uuid
 from typing import Any, Dict, List, Optional
 from dataclasses import dataclass
 
 import aiohttp
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
+from .rate_limiter import EndpointRateLimiter
+from .quota import QuotaLedger
 from .const import (
     LINE_API_BASE_URL,
     LINE_API_TIMEOUT,
+    LINE_API_POOL_SIZE,
+    LINE_API_KEEPALIVE_TIMEOUT,
+    LINE_API_DNS_CACHE_TTL,
+    LINE_API_RATE_LIMIT_PAUSE,
+    LINE_MULTICAST_MAX_RECIPIENTS,
+    LINE_API_MAX_RETRIES,
+    LINE_API_RETRY_BACKOFF,
+    LINE_API_RETRY_BACKOFF_MAX,
     LINE_API_REPLY_ENDPOINT,
     LINE_API_PUSH_ENDPOINT,
     LINE_API_MULTICAST_ENDPOINT,
@@ -23,8 +34,11 @@ from .const import (
     LINE_API_QUOTA_ENDPOINT,
     LINE_API_QUOTA_CONSUMPTION_ENDPOINT,
     LINE_API_PROFILE_ENDPOINT,
+    LINE_API_LOADING_ENDPOINT,
+    LINE_LOADING_SECONDS,
     CONTENT_TYPE_JSON,
     HTTP_USER_AGENT,
+    RETRY_KEY_HEADER,
     QUOTE_TOKEN_SUPPORTED_TYPES
 )
 
@@ -66,27 +80,110 @@ class LineApiResponse:
 class LineApiError(Exception):
     """LINE API 錯誤."""
     
-    def __init__(self, message: str, status_code: Optional[int] = None, response_data: Optional[Dict] = None):
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        response_data: Optional[Dict] = None,
+        headers: Optional[Dict[str, str]] = None,
+        retriable: Optional[bool] = None,
+    ):
         super().__init__(message)
         self.status_code = status_code
         self.response_data = response_data
+        self.headers = headers or {}
+        if retriable is None:
+            retriable = self._is_transient_status(status_code, response_data)
+        self.retriable = retriable
+
+    @staticmethod
+    def _is_transient_status(status_code: Optional[int], response_data: Optional[Dict]) -> bool:
+        """判斷 HTTP 狀態是否為暫時性錯誤."""
+        if status_code is None:
+            return False
+        if status_code == 429:
+            # 月配額用盡同樣回傳 429，重試無意義
+            message = (response_data or {}).get("message", "")
+            return "monthly limit" not in message
+        return status_code >= 500
+
+    @property
+    def retry_after(self) -> Optional[float]:
+        """取得 Retry-After 標頭秒數"""
+        value = self.headers.get("Retry-After") or self.headers.get("retry-after")
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+
+class QuotaExceededError(LineApiError):
+    """預估本月訊息配額不足，請求未送出."""
+
+    def __init__(self, message: str, deferrable: bool = False):
+        super().__init__(message, status_code=429, retriable=False)
+        # broadcast / narrowcast 可延後至配額恢復後再送
+        self.deferrable = deferrable
 
 
 class LineApiClient:
     """LINE Messaging API 客戶端."""
     
-    def __init__(self, hass: HomeAssistant, access_token: str):
-        """初始化 LINE API 客戶端."""
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        access_token: str,
+        pool_size: int = LINE_API_POOL_SIZE,
+        keepalive_timeout: float = LINE_API_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: int = LINE_API_DNS_CACHE_TTL,
+        quota_ledger: Optional[QuotaLedger] = None,
+    ):
+        """初始化 LINE API 客戶端.
+
+        :param quota_ledger: 發送前檢查配額、成功發送後記錄用量的帳本
+        """
         self.hass = hass
         self.access_token = access_token
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
         self._session: Optional[aiohttp.ClientSession] = None
-    
+        self.rate_limiter = EndpointRateLimiter()
+        self.quota_ledger = quota_ledger
+
     @property
     def session(self) -> aiohttp.ClientSession:
-        """取得 aiohttp session."""
-        if self._session is None:
-            self._session = async_get_clientsession(self.hass, verify_ssl=False)
+        """取得專屬於此 Bot 的 aiohttp session."""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
         return self._session
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """建立連線至 api.line.me 的專屬連線池.
+
+        所有請求都送往同一主機，因此 limit 與 limit_per_host 相同；
+        保持連線存活並快取 DNS，讓突發推送能重用已完成 TLS 握手的連線。
+        """
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.pool_size,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+            force_close=False,
+            enable_cleanup_closed=True,
+            ssl=False,
+        )
+        return aiohttp.ClientSession(
+            base_url=LINE_API_BASE_URL,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=LINE_API_TIMEOUT),
+        )
+
+    async def close(self) -> None:
+        """關閉連線池."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
     def _get_headers(self, additional_headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
         """取得請求標頭."""
@@ -106,21 +203,118 @@ class LineApiClient:
         data: Optional[Dict[str, Any]] = None,
         params: Optional[Dict[str, Any]] = None,
         additional_headers: Optional[Dict[str, str]] = None,
+        retry: bool = False,
+        error_log_level: int = logging.ERROR,
     ) -> LineApiResponse:
-        """發送 HTTP 請求到 LINE API."""
-        url = f"{LINE_API_BASE_URL}{endpoint}"
+        """發送 HTTP 請求到 LINE API.
+
+        retry 為 True 時，429、5xx 與逾時會以抖動指數退避重試；
+        帶有 X-Line-Retry-Key 的請求收到 409 代表已被接受，視為成功。
+
+        :param error_log_level: 最終失敗時的記錄等級（盡力而為的請求可使用 DEBUG）
+        """
+        has_retry_key = bool(additional_headers and RETRY_KEY_HEADER in additional_headers)
+        attempt = 0
+
+        while True:
+            try:
+                return await self._send_request(
+                    method, endpoint, data, params, additional_headers
+                )
+            except LineApiError as err:
+                if err.status_code == 409 and has_retry_key:
+                    accepted_request_id = err.headers.get("x-line-accepted-request-id")
+                    _LOGGER.debug(
+                        f"LINE API {method} {endpoint} already accepted, "
+                        f"Request ID: {accepted_request_id or 'N/A'}"
+                    )
+                    # 先前的請求已送達，以原請求 ID 回報成功
+                    headers = dict(err.headers)
+                    if accepted_request_id:
+                        headers["x-line-request-id"] = accepted_request_id
+                    return LineApiResponse(status_code=200, headers=headers, data=err.response_data)
+
+                if not retry or not err.retriable or attempt >= LINE_API_MAX_RETRIES:
+                    _LOGGER.log(error_log_level, f"{err}")
+                    raise
+
+                delay = self._get_retry_delay(attempt, err.retry_after)
+                attempt += 1
+                _LOGGER.warning(
+                    f"{err}, retrying in {delay:.1f}s ({attempt}/{LINE_API_MAX_RETRIES})"
+                )
+                await asyncio.sleep(delay)
+
+    def _check_quota(self, recipients: Optional[int], deferrable: bool = False) -> None:
+        """預估本月配額不足時直接拒絕，不送出注定失敗的請求."""
+        ledger = self.quota_ledger
+        if ledger is not None and not ledger.admit(recipients):
+            raise QuotaExceededError(
+                f"Monthly message quota would be exceeded "
+                f"(used {ledger.usage} of {ledger.limit}, remaining {ledger.remaining})",
+                deferrable=deferrable,
+            )
+
+    async def _send_counted(
+        self,
+        endpoint: str,
+        data: Dict[str, Any],
+        retry_key: Optional[str],
+        recipients: Optional[int],
+        deferrable: bool = False,
+    ) -> LineApiResponse:
+        """發送計入配額的訊息（收件者數未知時為 None）."""
+        self._check_quota(recipients, deferrable)
+
+        additional_headers = {RETRY_KEY_HEADER: retry_key or str(uuid.uuid4())}
+        try:
+            response = await self._make_request(
+                "POST",
+                endpoint,
+                data=data,
+                additional_headers=additional_headers,
+                retry=True,
+            )
+        except LineApiError as err:
+            # 不可重試的 429 代表月配額已用盡
+            if self.quota_ledger is not None and err.status_code == 429 and not err.retriable:
+                self.quota_ledger.mark_exhausted()
+                if deferrable:
+                    raise QuotaExceededError(f"{err}", deferrable=True) from err
+            raise
+
+        if self.quota_ledger is not None:
+            self.quota_ledger.record(recipients)
+        return response
+
+    @staticmethod
+    def _get_retry_delay(attempt: int, retry_after: Optional[float]) -> float:
+        """計算重試延遲（full jitter 指數退避，並遵守 Retry-After）."""
+        backoff = min(LINE_API_RETRY_BACKOFF_MAX, LINE_API_RETRY_BACKOFF * (2 ** attempt))
+        delay = random.uniform(0, backoff)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def _send_request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        additional_headers: Optional[Dict[str, str]] = None,
+    ) -> LineApiResponse:
+        """發送單次 HTTP 請求."""
         headers = self._get_headers(additional_headers)
+        await self.rate_limiter.acquire(endpoint)
         
         try:
-            timeout = aiohttp.ClientTimeout(total=LINE_API_TIMEOUT)
-            
             async with self.session.request(
                 method=method,
-                url=url,
+                url=endpoint,
                 headers=headers,
                 json=data if data else None,
                 params=params,
-                timeout=timeout,
             ) as response:
                 response_headers = dict(response.headers)
                 response_text = await response.text()
@@ -142,11 +336,22 @@ class LineApiClient:
                     if error_data and "message" in error_data:
                         error_message += f" - {error_data['message']}"
                     
-                    _LOGGER.error(f"{error_message}, Response: {response_text}")
-                    raise LineApiError(
-                        error_message, response.status, error_data
+                    _LOGGER.debug(f"{error_message}, Response: {response_text}")
+                    error = LineApiError(
+                        error_message,
+                        response.status,
+                        error_data,
+                        headers=response_headers,
                     )
-                
+
+                    # 依伺服器回報調整速率限制；月配額用盡的 429 不可重試，暫停端點也無濟於事
+                    if response.status == 429 and error.retriable:
+                        self.rate_limiter.block(
+                            endpoint,
+                            error.retry_after or LINE_API_RATE_LIMIT_PAUSE,
+                        )
+                    raise error
+
                 # 解析成功回應
                 response_data = None
                 if response_text:
@@ -155,23 +360,24 @@ class LineApiClient:
                     except json.JSONDecodeError as e:
                         _LOGGER.warning(f"Failed to parse LINE API response as JSON: {e}")
                 
-                return LineApiResponse(
+                api_response = LineApiResponse(
                     status_code=response.status,
                     headers=response_headers,
                     data=response_data,
                 )
+                self.rate_limiter.update(endpoint, api_response.rate_limit_remaining)
+                return api_response
                 
+        except LineApiError:
+            raise
         except asyncio.TimeoutError as e:
             error_message = f"LINE API request timeout: {method} {endpoint}"
-            _LOGGER.error(f"{error_message}")
-            raise LineApiError(error_message) from e
+            raise LineApiError(error_message, retriable=True) from e
         except aiohttp.ClientError as e:
             error_message = f"LINE API client error: {method} {endpoint} - {e}"
-            _LOGGER.error(f"{error_message}")
-            raise LineApiError(error_message) from e
+            raise LineApiError(error_message, retriable=True) from e
         except Exception as e:
             error_message = f"Unexpected error in LINE API request: {method} {endpoint} - {e}"
-            _LOGGER.error(f"{error_message}")
             raise LineApiError(error_message) from e
     
     async def get_bot_info(self) -> LineApiResponse:
@@ -191,6 +397,28 @@ class LineApiClient:
         endpoint = f"{LINE_API_PROFILE_ENDPOINT}/{user_id}"
         return await self._make_request("GET", endpoint)
 
+    async def start_loading_animation(
+        self,
+        chat_id: str,
+        loading_seconds: int = LINE_LOADING_SECONDS,
+    ) -> LineApiResponse:
+        """顯示載入動畫（僅支援一對一聊天，傳送訊息後自動消失）.
+
+        :param loading_seconds: 顯示秒數（5 到 60 之間的 5 的倍數）
+        """
+        data = {
+            "chatId": chat_id,
+            "loadingSeconds": loading_seconds,
+        }
+
+        # 載入動畫僅為輔助，失敗由呼叫端決定是否記錄
+        return await self._make_request(
+            "POST",
+            LINE_API_LOADING_ENDPOINT,
+            data=data,
+            error_log_level=logging.DEBUG,
+        )
+
     async def reply_message(
         self,
         reply_token: str,
@@ -228,16 +456,7 @@ class LineApiClient:
         if custom_aggregation_units:
             data["customAggregationUnits"] = custom_aggregation_units
 
-        additional_headers = {}
-        if retry_key:
-            additional_headers["X-Line-Retry-Key"] = retry_key
-
-        return await self._make_request(
-            "POST",
-            LINE_API_PUSH_ENDPOINT,
-            data=data,
-            additional_headers=additional_headers
-        )
+        return await self._send_counted(LINE_API_PUSH_ENDPOINT, data, retry_key, 1)
 
     async def multicast(
         self,
@@ -257,16 +476,45 @@ class LineApiClient:
         if custom_aggregation_units:
             data["customAggregationUnits"] = custom_aggregation_units
 
-        additional_headers = {}
-        if retry_key:
-            additional_headers["X-Line-Retry-Key"] = retry_key
+        return await self._send_counted(LINE_API_MULTICAST_ENDPOINT, data, retry_key, len(to))
 
-        return await self._make_request(
-            "POST",
-            LINE_API_MULTICAST_ENDPOINT,
-            data=data,
-            additional_headers=additional_headers
-        )
+    async def multicast_all(
+        self,
+        to: List[str],
+        messages: List[Dict[str, Any]],
+        notification_disabled: bool = False,
+        custom_aggregation_units: Optional[str] = None,
+        retry_key: Optional[str] = None,
+    ) -> List[LineApiResponse]:
+        """群發訊息給任意數量的收件者.
+
+        收件者超過單次上限時自動分批並同時發送；指定 retry_key 時，
+        每批以 retry_key 衍生出固定的 UUID，重新呼叫時仍保持冪等。
+        """
+        # 配額不足時整批拒絕，避免只送出部分分批
+        self._check_quota(len(to))
+
+        chunks = [
+            to[i:i + LINE_MULTICAST_MAX_RECIPIENTS]
+            for i in range(0, len(to), LINE_MULTICAST_MAX_RECIPIENTS)
+        ]
+
+        def _chunk_retry_key(index: int) -> Optional[str]:
+            if not retry_key or len(chunks) == 1:
+                return retry_key
+            # retry_key 不一定是 UUID 格式，以固定命名空間衍生
+            return str(uuid.uuid5(uuid.NAMESPACE_OID, f"{retry_key}:{index}"))
+
+        return await asyncio.gather(*(
+            self.multicast(
+                to=chunk,
+                messages=messages,
+                notification_disabled=notification_disabled,
+                custom_aggregation_units=custom_aggregation_units,
+                retry_key=_chunk_retry_key(index),
+            )
+            for index, chunk in enumerate(chunks)
+        ))
 
     async def broadcast(
         self,
@@ -284,16 +532,7 @@ class LineApiClient:
         if custom_aggregation_units:
             data["customAggregationUnits"] = custom_aggregation_units
 
-        additional_headers = {}
-        if retry_key:
-            additional_headers["X-Line-Retry-Key"] = retry_key
-
-        return await self._make_request(
-            "POST",
-            LINE_API_BROADCAST_ENDPOINT,
-            data=data,
-            additional_headers=additional_headers
-        )
+        return await self._send_counted(LINE_API_BROADCAST_ENDPOINT, data, retry_key, None, deferrable=True)
 
     async def narrowcast(
         self,
@@ -319,16 +558,7 @@ class LineApiClient:
         if limit:
             data["limit"] = limit
 
-        additional_headers = {}
-        if retry_key:
-            additional_headers["X-Line-Retry-Key"] = retry_key
-
-        return await self._make_request(
-            "POST",
-            LINE_API_NARROWCAST_ENDPOINT,
-            data=data,
-            additional_headers=additional_headers
-        )
+        return await self._send_counted(LINE_API_NARROWCAST_ENDPOINT, data, retry_key, None, deferrable=True)
 
 
 def create_text_message(text: str, quote_token: Optional[str] = None) -> Dict[str, Any]:
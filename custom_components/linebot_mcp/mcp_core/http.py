@@ -2,17 +2,30 @@
 from __future__ import annotations
 
 import logging
+from functools import partial
 
 import anyio
 from aiohttp import web
-from aiohttp.web_exceptions import HTTPBadRequest, HTTPNotFound
+from aiohttp.web_exceptions import (
+    HTTPBadRequest,
+    HTTPConflict,
+    HTTPNotFound,
+    HTTPTooManyRequests,
+)
 from aiohttp_sse import sse_response
 from homeassistant.components.http import KEY_HASS, HomeAssistantView
 from homeassistant.core import HomeAssistant, callback
 from mcp import types
 
 from .server import MCPServerManager
-from .session import Session
+from .session import CURRENT_SESSION, Session
+from .streamable_http import (
+    LAST_EVENT_ID_HEADER,
+    MCP_SESSION_ID_HEADER,
+    STANDALONE_STREAM,
+    StoredEvent,
+    StreamableHTTPSession,
+)
 
 from ..const import (
     DOMAIN, 
@@ -25,6 +38,7 @@ from ..const import (
 _LOGGER = logging.getLogger(__name__)
 SSE_API = f"/linebotmcp/sse"
 MESSAGES_API = f"/linebotmcp/messages/{{session_id}}"
+STREAMABLE_HTTP_API = "/linebotmcp/mcp"
 
 
 @callback
@@ -32,6 +46,7 @@ def async_register(hass: HomeAssistant) -> None:
     """註冊 HTTP API"""
     hass.http.register_view(LineBotMCPSSEView())
     hass.http.register_view(LineBotMCPMessagesView())
+    hass.http.register_view(LineBotMCPStreamableHTTPView())
 
 
 def get_manager(hass: HomeAssistant):
@@ -45,9 +60,42 @@ def get_manager(hass: HomeAssistant):
 
 
 async def get_server(hass: HomeAssistant):
-    """獲取 LINE Bot MCP server"""
+    """獲取 LINE Bot MCP server 與快取的初始化選項"""
     server_manager = hass.data[DOMAIN][SERVER_MANAGER]
-    return await server_manager.get_server()
+    return await server_manager.get_server_with_options()
+
+
+def get_streamable_session(request: web.Request, session_manager) -> tuple[str, StreamableHTTPSession]:
+    """依 Mcp-Session-Id 標頭獲取 Streamable HTTP 會話"""
+    if (session_id := request.headers.get(MCP_SESSION_ID_HEADER)) is None:
+        raise HTTPBadRequest(text=f"Missing {MCP_SESSION_ID_HEADER} header")
+
+    session = session_manager.get(session_id)
+    if not isinstance(session, StreamableHTTPSession):
+        _LOGGER.info(f"Could not find session ID: '{session_id}'")
+        raise HTTPNotFound(text=f"Could not find session ID '{session_id}'")
+
+    session.touch()
+    return session_id, session
+
+
+def _dump_message(message: types.JSONRPCMessage) -> str:
+    """序列化 JSON-RPC 訊息"""
+    return message.model_dump_json(by_alias=True, exclude_none=True)
+
+
+def _buffer_full(session_id: str) -> HTTPTooManyRequests:
+    """會話緩衝區已滿的回應"""
+    _LOGGER.warning(f"MCP session {session_id} buffer is full, rejecting message")
+    return HTTPTooManyRequests(
+        text=f"Session '{session_id}' is busy", headers={"Retry-After": "1"}
+    )
+
+
+async def _send_event(response, event: StoredEvent) -> None:
+    """以 SSE 送出事件"""
+    _LOGGER.debug(f"Sending streamable HTTP event {event.event_id}: {event.message}")
+    await response.send(_dump_message(event.message), id=event.event_id, event="message")
 
 
 class LineBotMCPSSEView(HomeAssistantView):
@@ -64,17 +112,15 @@ class LineBotMCPSSEView(HomeAssistantView):
         
         try:
             session_manager, shutdown_event = get_manager(hass)
-            server = await get_server(hass)  
-            options = await hass.async_add_executor_job(
-                server.create_initialization_options  # Reads package for version info
-            )
+            server, options = await get_server(hass)
 
-            read_stream_writer, read_stream_reader = anyio.create_memory_object_stream(0)
-            write_stream_writer, write_stream_reader = anyio.create_memory_object_stream(0)
+            read_stream_writer, read_stream_reader = session_manager.create_streams()
+            write_stream_writer, write_stream_reader = session_manager.create_streams()
+            session = Session(read_stream_writer, write_stream_writer)
 
             async with (
                 sse_response(request) as response,
-                session_manager.create(Session(read_stream_writer)) as session_id,
+                session_manager.create(session) as session_id,
             ):
                 session_uri = MESSAGES_API.format(session_id=session_id)
                 _LOGGER.debug(f"Sending SSE endpoint: {session_uri}")
@@ -84,6 +130,7 @@ class LineBotMCPSSEView(HomeAssistantView):
                     """轉發 MCP 服務器回應給客戶端"""
                     try:
                         async for message in write_stream_reader:
+                            session.stats.record_outbound(write_stream_writer)
                             _LOGGER.debug(f"Sending SSE message: {message}")
                             try:
                                 with anyio.fail_after(5):
@@ -102,6 +149,7 @@ class LineBotMCPSSEView(HomeAssistantView):
                 
                 async def server_runner() -> None:
                     """運行 MCP 伺服器"""
+                    CURRENT_SESSION.set(session)
                     try:
                         await server.run(read_stream_reader, write_stream_writer, options)
                     except anyio.get_cancelled_exc_class():
@@ -159,11 +207,148 @@ class LineBotMCPMessagesView(HomeAssistantView):
             message = types.JSONRPCMessage.model_validate(json_data)
             _LOGGER.debug(f"Received client message: {message}")
 
-            await session.read_stream_writer.send(message)
+            if not await session_manager.send(session, message):
+                raise _buffer_full(session_id)
             return web.Response(status=200)
+        except HTTPTooManyRequests:
+            raise
         except ValueError as err:
             _LOGGER.info(f"Failed to parse message: {err}")
             raise HTTPBadRequest(text="Could not parse message") from err
         except Exception as e:
             _LOGGER.error(f"Error handling message: {e}")
             raise HTTPBadRequest(text="Could not handle message") from e
+
+
+class LineBotMCPStreamableHTTPView(HomeAssistantView):
+    """LINE Bot MCP Streamable HTTP 端點
+
+    單一 POST 即可送出 JSON-RPC 訊息並取得回應（JSON 或 SSE 串流），
+    不需為每個客戶端維持長時間的 SSE 連線。
+    """
+
+    name = f"{DOMAIN}:mcp"
+    url = STREAMABLE_HTTP_API
+    requires_auth = True
+
+    async def post(self, request: web.Request):
+        """處理 JSON-RPC 訊息（單一或批次）"""
+        hass = request.app[KEY_HASS]
+        session_manager, _ = get_manager(hass)
+
+        try:
+            json_data = await request.json()
+            is_batch = isinstance(json_data, list)
+            messages = [
+                types.JSONRPCMessage.model_validate(data)
+                for data in (json_data if is_batch else [json_data])
+            ]
+        except ValueError as err:
+            _LOGGER.info(f"Failed to parse message: {err}")
+            raise HTTPBadRequest(text="Could not parse message") from err
+
+        request_ids = [
+            message.root.id for message in messages
+            if isinstance(message.root, types.JSONRPCRequest)
+        ]
+        is_initialize = any(
+            isinstance(message.root, types.JSONRPCRequest) and message.root.method == "initialize"
+            for message in messages
+        )
+
+        if is_initialize:
+            if MCP_SESSION_ID_HEADER in request.headers:
+                raise HTTPBadRequest(text="Session is already initialized")
+            server, options = await get_server(hass)
+            session = StreamableHTTPSession(session_manager.buffer_size)
+            session_id = session_manager.add(session)
+            session.start(hass, server, options, partial(session_manager.remove, session_id))
+        else:
+            session_id, session = get_streamable_session(request, session_manager)
+
+        headers = {MCP_SESSION_ID_HEADER: session_id}
+        try:
+            if not request_ids:
+                # 只有通知或回應時不需等待伺服器
+                for message in messages:
+                    if not await session_manager.send(session, message):
+                        raise _buffer_full(session_id)
+                return web.Response(status=202, headers=headers)
+
+            stream_id, queue = session.open_stream(request_ids)
+            try:
+                for index, message in enumerate(messages):
+                    _LOGGER.debug(f"Received client message: {message}")
+                    if not await session_manager.send(session, message):
+                        # 未送入的請求不會有回應
+                        session.discard_requests(
+                            rejected.root.id for rejected in messages[index:]
+                            if isinstance(rejected.root, types.JSONRPCRequest)
+                        )
+                        raise _buffer_full(session_id)
+
+                if "text/event-stream" in request.headers.get("Accept", "") and (
+                    "application/json" not in request.headers.get("Accept", "")
+                ):
+                    async with sse_response(request, headers=headers) as response:
+                        async for event in session.iter_stream(stream_id, queue):
+                            await _send_event(response, event)
+                    return response
+
+                # 可接受 JSON 時直接回傳，省去串流的開銷
+                results = [
+                    _dump_message(event.message)
+                    async for event in session.iter_stream(stream_id, queue)
+                ]
+                if not results:
+                    raise HTTPNotFound(text="Session was closed")
+                return web.Response(
+                    text=f"[{','.join(results)}]" if is_batch else results[0],
+                    content_type="application/json",
+                    headers=headers,
+                )
+            finally:
+                session.close_stream(stream_id)
+
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError) as err:
+            session_manager.remove(session_id)
+            raise HTTPNotFound(text=f"Session '{session_id}' was closed") from err
+
+    async def get(self, request: web.Request):
+        """開啟伺服器訊息串流，或以 Last-Event-ID 續傳中斷的串流"""
+        hass = request.app[KEY_HASS]
+        session_manager, _ = get_manager(hass)
+        session_id, session = get_streamable_session(request, session_manager)
+
+        replay: list[StoredEvent] = []
+        if last_event_id := request.headers.get(LAST_EVENT_ID_HEADER):
+            try:
+                resumed = session.resume_stream(last_event_id)
+            except ValueError as err:
+                raise HTTPBadRequest(text=f"Invalid {LAST_EVENT_ID_HEADER}") from err
+            if resumed is None:
+                raise HTTPConflict(text="Stream is already open")
+            stream_id, queue, replay = resumed
+            _LOGGER.debug(f"Resuming stream {stream_id} with {len(replay)} event(s)")
+        else:
+            if (queue := session.open_standalone_stream()) is None:
+                raise HTTPConflict(text="Stream is already open")
+            stream_id = STANDALONE_STREAM
+
+        try:
+            async with sse_response(request, headers={MCP_SESSION_ID_HEADER: session_id}) as response:
+                for event in replay:
+                    await _send_event(response, event)
+                async for event in session.iter_stream(stream_id, queue):
+                    await _send_event(response, event)
+            return response
+        finally:
+            session.close_stream(stream_id)
+
+    async def delete(self, request: web.Request):
+        """結束會話"""
+        hass = request.app[KEY_HASS]
+        session_manager, _ = get_manager(hass)
+        session_id, _ = get_streamable_session(request, session_manager)
+        session_manager.remove(session_id)
+        return web.Response(status=200)
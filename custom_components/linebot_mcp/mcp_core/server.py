@@ -3,21 +3,39 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
+from weakref import WeakKeyDictionary
+from functools import partial
 from typing import Any, Optional
 
 from mcp import types
 from mcp.server import Server
+from mcp.server.models import InitializationOptions
+from mcp.shared.exceptions import McpError
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import HomeAssistantError
 
+from .session import CURRENT_SESSION
+from .validation import SchemaValidationError, compile_schema
+from ..message_schema import LINE_MESSAGE_SCHEMA
+from ..dispatcher import (
+    PRIORITY_PUSH,
+    PRIORITY_BROADCAST,
+    MessageDeferredError,
+)
 from ..const import (
     DOMAIN,
     SERVICE_MANAGER,
+    MESSAGE_DISPATCHER,
     MCP_TOOL_PUSH_MESSAGE,
     MCP_TOOL_REPLY_MESSAGE,
+    MCP_TOOL_MULTICAST_MESSAGE,
+    MCP_TOOL_BROADCAST_MESSAGE,
+    MCP_TOOL_NARROWCAST_MESSAGE,
     MCP_TOOL_GET_QUOTA_INFO,
     EVENT_MCP_TOOL_CALLED,
+    MCP_TOOL_CONCURRENCY,
+    MCP_SESSION_TOOL_CONCURRENCY,
 )
 
 
@@ -27,77 +45,7 @@ _LOGGER = logging.getLogger(__name__)
 # LINE 訊息格式定義
 def _get_line_message_schema() -> dict:
     """獲取 LINE 訊息格式的 JSON Schema"""
-    return {
-        "type": "object",
-        "description": "LINE message: text, image, or location",
-        "oneOf": [
-            {
-                "properties": {
-                    "type": {
-                        "type": "string",
-                        "enum": ["text"],
-                        "description": "Text message"
-                    },
-                    "text": {
-                        "type": "string",
-                        "description": "Message content",
-                        "maxLength": 5000
-                    }
-                },
-                "required": ["type", "text"]
-            },
-            {
-                "properties": {
-                    "type": {
-                        "type": "string",
-                        "enum": ["image"],
-                        "description": "Image message"
-                    },
-                    "originalContentUrl": {
-                        "type": "string",
-                        "format": "uri",
-                        "description": "HTTPS URL of original image (JPEG/PNG, max 10MB)",
-                        "maxLength": 2000
-                    },
-                    "previewImageUrl": {
-                        "type": "string",
-                        "format": "uri",
-                        "description": "HTTPS URL of preview image (max 1MB)",
-                        "maxLength": 2000
-                    }
-                },
-                "required": ["type", "originalContentUrl", "previewImageUrl"]
-            },
-            {
-                "properties": {
-                    "type": {
-                        "type": "string",
-                        "enum": ["location"],
-                        "description": "Location message"
-                    },
-                    "title": {
-                        "type": "string",
-                        "description": "Location title/label"
-                    },
-                    "address": {
-                        "type": "string",
-                        "description": "Full address"
-                    },
-                    "latitude": {
-                        "type": "number",
-                        "description": "Latitude coordinate"
-                    },
-                    "longitude": {
-                        "type": "number",
-                        "description": "Longitude coordinate"
-                    }
-                },
-                "required": ["type", "address", "latitude", "longitude"]
-            }
-        ]
-    }
-
-
+    return LINE_MESSAGE_SCHEMA
 
 
 class LineBotMCP:
@@ -109,11 +57,66 @@ class LineBotMCP:
         self._api_client = None
         self._send_toolname = MCP_TOOL_PUSH_MESSAGE
         self._reply_toolname = MCP_TOOL_REPLY_MESSAGE
+        self._multicast_toolname = MCP_TOOL_MULTICAST_MESSAGE
+        self._broadcast_toolname = MCP_TOOL_BROADCAST_MESSAGE
+        self._narrowcast_toolname = MCP_TOOL_NARROWCAST_MESSAGE
         self._quota_toolname = MCP_TOOL_GET_QUOTA_INFO
+        self._tool_definitions: Optional[list[types.Tool]] = None
+        # 工具名稱 -> 預先編譯的參數驗證函式
+        self._validators: dict[str, Callable[[Any], None]] = {}
+        self._handlers = {
+            self._send_toolname: self._handle_send_message,
+            self._reply_toolname: self._handle_reply_message,
+            self._multicast_toolname: self._handle_multicast_message,
+            self._broadcast_toolname: self._handle_broadcast_message,
+            self._narrowcast_toolname: self._handle_narrowcast_message,
+            self._quota_toolname: self._handle_get_quota_info,
+        }
+
+    def get_tool_definitions(self) -> list[types.Tool]:
+        """獲取工具定義（建立後快取，Bot 新增或移除時重建）"""
+        if self._tool_definitions is None:
+            self._tool_definitions = self._build_tool_definitions()
+            self._validators = {
+                tool.name: compile_schema(tool.inputSchema)
+                for tool in self._tool_definitions
+            }
+        return self._tool_definitions
+
+    def invalidate(self) -> None:
+        """Bot 新增、移除或重新載入後清除快取的工具定義與 API 客戶端"""
+        self._tool_definitions = None
+        self._validators = {}
+        self._api_client = None
+
+    def validate_arguments(self, tool_name: str, arguments: dict[str, Any]) -> None:
+        """依工具的 inputSchema 驗證參數（未知工具交由 call_tool 處理）
+
+        :raises SchemaValidationError: 參數不符合 schema
+        """
+        self.get_tool_definitions()
+        if (validate := self._validators.get(tool_name)) is None:
+            return
+        try:
+            validate(arguments)
+        except SchemaValidationError as e:
+            _LOGGER.debug(f"Invalid arguments for {tool_name}: {e}")
+            self._fire_tool_event(tool_name, {
+                "error": str(e),
+                "success": False
+            })
+            raise
+
+    def _build_tool_definitions(self) -> list[types.Tool]:
+        """建立工具定義"""
+        bot_id_schema: dict[str, Any] = {
+            "type": "string",
+            "description": "Line Bot ID"
+        }
+        if bot_ids := sorted(self._get_bot_clients()):
+            bot_id_schema["enum"] = bot_ids
+        message_schema = _get_line_message_schema()
 
-    @property
-    def _get_tool_definitions(self) -> list[types.Tool]:
-        """獲取工具定義"""
         return [
             types.Tool(
                 name=self._send_toolname,
@@ -121,10 +124,7 @@ class LineBotMCP:
                 inputSchema={
                     "type": "object",
                     "properties": {
-                        "botID": {
-                            "type": "string",
-                            "description": "Line Bot ID"
-                        },
+                        "botID": bot_id_schema,
                         "to": {
                             "type": "string",
                             "description": "User ID (starts with U), Group ID (starts with C), or Room ID (starts with R)",
@@ -133,7 +133,7 @@ class LineBotMCP:
                         "messages": {
                             "type": "array",
                             "description": "Array of messages to send",
-                            "items": _get_line_message_schema(),
+                            "items": message_schema,
                             "minItems": 1,
                             "maxItems": 5    
                         }
@@ -147,17 +147,14 @@ class LineBotMCP:
                 inputSchema={
                     "type": "object",
                     "properties": {
-                        "botID": {
-                            "type": "string",
-                            "description": "Line Bot ID"
-                        },
+                        "botID": bot_id_schema,
                         "reply_token": {
                             "type": "string",
                             "description": "Reply token from webhook (30s validity)"
                         },
                         "messages": {
                             "type": "array",
-                            "items": _get_line_message_schema(),
+                            "items": message_schema,
                             "minItems": 1,
                             "maxItems": 5    
                         }
@@ -165,36 +162,125 @@ class LineBotMCP:
                     "required": ["botID", "reply_token", "messages"]
                 }
             ),
+            types.Tool(
+                name=self._multicast_toolname,
+                description=(
+                    "Send the same messages to multiple LINE users at once. "
+                    "Lists larger than 500 users are split automatically (max 5 messages per request)"
+                ),
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "botID": bot_id_schema,
+                        "to": {
+                            "type": "array",
+                            "description": "User IDs (start with U) to send messages to",
+                            "items": {
+                                "type": "string",
+                                "pattern": "^U[0-9a-f]{32}$"
+                            },
+                            "minItems": 1
+                        },
+                        "messages": {
+                            "type": "array",
+                            "description": "Array of messages to send",
+                            "items": message_schema,
+                            "minItems": 1,
+                            "maxItems": 5    
+                        }
+                    },
+                    "required": ["botID", "to", "messages"]
+                }
+            ),
+            types.Tool(
+                name=self._broadcast_toolname,
+                description="Send messages to every friend of the LINE Bot (max 5 messages per request)",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "botID": bot_id_schema,
+                        "messages": {
+                            "type": "array",
+                            "description": "Array of messages to send",
+                            "items": message_schema,
+                            "minItems": 1,
+                            "maxItems": 5    
+                        }
+                    },
+                    "required": ["botID", "messages"]
+                }
+            ),
+            types.Tool(
+                name=self._narrowcast_toolname,
+                description=(
+                    "Send messages to LINE Bot friends selected by audience or demographic filter "
+                    "(max 5 messages per request)"
+                ),
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "botID": bot_id_schema,
+                        "messages": {
+                            "type": "array",
+                            "description": "Array of messages to send",
+                            "items": message_schema,
+                            "minItems": 1,
+                            "maxItems": 5    
+                        },
+                        "recipient": {
+                            "type": "object",
+                            "description": "LINE narrowcast recipient object (audience or redelivery)"
+                        },
+                        "filter": {
+                            "type": "object",
+                            "description": "LINE narrowcast demographic filter object"
+                        },
+                        "limit": {
+                            "type": "object",
+                            "description": "LINE narrowcast limit object, e.g. {\"max\": 100}"
+                        }
+                    },
+                    "required": ["botID", "messages"]
+                }
+            ),
             types.Tool(
                 name=self._quota_toolname,
                 description="Get LINE Bot monthly message quota usage information",
                 inputSchema={
                     "type": "object", 
                     "properties": {
-                        "botID": {
-                            "type": "string",
-                            "description": "Line Bot ID"
-                        }
+                        "botID": bot_id_schema
                     },
                     "required": ["botID"]
                 }
             )
         ]
 
+    def _get_bot_clients(self) -> dict[str, Any]:
+        """獲取所有 Bot 的 LINE API 客戶端（快取至下次 invalidate）"""
+        if self._api_client is None:
+            service_manager = self.hass.data[DOMAIN][SERVICE_MANAGER]
+            self._api_client = service_manager.get_bot_client
+        return self._api_client
+
     def _get_api_client(self, botname):
         """獲取 LINE API 客戶端"""
         try:
-            if self._api_client is None:
-                service_manager = self.hass.data[DOMAIN][SERVICE_MANAGER]
-                self._api_client = service_manager.get_bot_client
-            
             if not botname:
                 raise HomeAssistantError("Invalid bot ID")
 
-            return self._api_client[botname]
+            return self._get_bot_clients()[botname]
         except KeyError as e:
             raise HomeAssistantError(f"LINE API client not found: {e}") from e
 
+    def _get_dispatcher(self, botname):
+        """獲取 Bot 的訊息派送佇列"""
+        try:
+            service_manager = self.hass.data[DOMAIN][SERVICE_MANAGER]
+            return service_manager.get_entry_data(botname)[MESSAGE_DISPATCHER]
+        except (KeyError, ValueError) as e:
+            raise HomeAssistantError(f"LINE Bot dispatcher not found: {e}") from e
+
     def _fire_tool_event(self, tool_name: str, data: dict[str, Any]) -> None:
         """觸發工具調用事件"""
         event_data = {
@@ -215,7 +301,8 @@ class LineBotMCP:
             "messages": arguments["messages"],
         }
 
-        await client.push_message(**api_data)
+        dispatcher = self._get_dispatcher(botname)
+        await dispatcher.run(PRIORITY_PUSH, partial(client.push_message, **api_data), "push")
 
         message_count = len(arguments["messages"])
         self._fire_tool_event(self._send_toolname, {
@@ -233,13 +320,13 @@ class LineBotMCP:
     async def _handle_reply_message(self, arguments: dict[str, Any]) -> Sequence[types.TextContent]:
         """處理回覆訊息工具"""
         botname = arguments["botID"]
-        client = self._get_api_client(botname)
         api_data = {
             "reply_token": arguments["reply_token"],
             "messages": arguments["messages"],
         }
 
-        await client.reply_message(**api_data)
+        dispatcher = self._get_dispatcher(botname)
+        await dispatcher.reply(**api_data)
 
         message_count = len(arguments["messages"])
         self._fire_tool_event(self._reply_toolname, {
@@ -254,6 +341,116 @@ class LineBotMCP:
             text=f"{message_count} reply message(s) sent successfully via {botname}"
         )]
 
+    async def _handle_multicast_message(self, arguments: dict[str, Any]) -> Sequence[types.TextContent]:
+        """處理群發訊息工具"""
+        botname = arguments["botID"]
+        client = self._get_api_client(botname)
+        api_data = {
+            "to": arguments["to"],
+            "messages": arguments["messages"],
+        }
+
+        dispatcher = self._get_dispatcher(botname)
+        await dispatcher.run(
+            PRIORITY_BROADCAST, partial(client.multicast_all, **api_data), "multicast"
+        )
+
+        message_count = len(arguments["messages"])
+        recipient_count = len(arguments["to"])
+        self._fire_tool_event(self._multicast_toolname, {
+            "botname": botname,
+            "recipient_count": recipient_count,
+            "message_count": message_count,
+            "success": True
+        })
+
+        return [types.TextContent(
+            type="text",
+            text=f"{message_count} message(s) sent successfully to {recipient_count} user(s) via {botname}"
+        )]
+
+    async def _handle_broadcast_message(self, arguments: dict[str, Any]) -> Sequence[types.TextContent]:
+        """處理廣播訊息工具"""
+        botname = arguments["botID"]
+        client = self._get_api_client(botname)
+
+        dispatcher = self._get_dispatcher(botname)
+        message_count = len(arguments["messages"])
+        try:
+            await dispatcher.run(
+                PRIORITY_BROADCAST,
+                partial(client.broadcast, messages=arguments["messages"]),
+                "broadcast",
+            )
+        except MessageDeferredError as e:
+            return self._deferred_result(self._broadcast_toolname, botname, message_count, e)
+
+        self._fire_tool_event(self._broadcast_toolname, {
+            "botname": botname,
+            "message_count": message_count,
+            "success": True
+        })
+
+        return [types.TextContent(
+            type="text",
+            text=f"{message_count} message(s) broadcast successfully via {botname}"
+        )]
+
+    async def _handle_narrowcast_message(self, arguments: dict[str, Any]) -> Sequence[types.TextContent]:
+        """處理 narrowcast 訊息工具"""
+        botname = arguments["botID"]
+        client = self._get_api_client(botname)
+        api_data = {
+            "messages": arguments["messages"],
+            "recipient": arguments.get("recipient"),
+            "filter_dict": arguments.get("filter"),
+            "limit": arguments.get("limit"),
+        }
+
+        dispatcher = self._get_dispatcher(botname)
+        message_count = len(arguments["messages"])
+        try:
+            response = await dispatcher.run(
+                PRIORITY_BROADCAST, partial(client.narrowcast, **api_data), "narrowcast"
+            )
+        except MessageDeferredError as e:
+            return self._deferred_result(self._narrowcast_toolname, botname, message_count, e)
+
+        self._fire_tool_event(self._narrowcast_toolname, {
+            "botname": botname,
+            "message_count": message_count,
+            "request_id": response.request_id,
+            "success": True
+        })
+
+        return [types.TextContent(
+            type="text",
+            text=(
+                f"{message_count} narrowcast message(s) accepted via {botname} "
+                f"(request ID: {response.request_id})"
+            )
+        )]
+
+    def _deferred_result(
+        self, tool_name: str, botname: str, message_count: int, err: MessageDeferredError
+    ) -> Sequence[types.TextContent]:
+        """配額不足而延後發送的工具結果"""
+        self._fire_tool_event(tool_name, {
+            "botname": botname,
+            "message_count": message_count,
+            "job_id": err.job_id,
+            "deferred": True,
+            "success": True
+        })
+
+        return [types.TextContent(
+            type="text",
+            text=(
+                f"Monthly message quota of {botname} is exhausted; {message_count} message(s) "
+                f"deferred as job {err.job_id} and will be sent once quota is available"
+            )
+        )]
+
     async def _handle_get_quota_info(self, arguments: dict[str, Any]) -> Sequence[types.TextContent]:
         """處理獲取配額資訊工具"""
         botname = arguments["botID"]
@@ -280,15 +477,11 @@ class LineBotMCP:
         _LOGGER.debug(f"Tool call {tool_name}: {arguments}")
 
         try:
-            if tool_name == self._send_toolname:
-                return await self._handle_send_message(arguments)
-            elif tool_name == self._reply_toolname:
-                return await self._handle_reply_message(arguments)
-            elif tool_name == self._quota_toolname:
-                return await self._handle_get_quota_info(arguments)
-            else:
+            if (handler := self._handlers.get(tool_name)) is None:
                 raise HomeAssistantError(f"Unknown tool: {tool_name}")
 
+            return await handler(arguments)
+
         except Exception as e:
             _LOGGER.error(f"Error calling : {e}")
             self._fire_tool_event(tool_name, {
@@ -301,17 +494,55 @@ class LineBotMCP:
 class MCPServerManager:
     """MCP Server 管理器"""
     
-    def __init__(self, hass: HomeAssistant):
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        max_tool_calls: int = MCP_TOOL_CONCURRENCY,
+        max_session_tool_calls: int = MCP_SESSION_TOOL_CONCURRENCY,
+    ):
+        """初始化
+
+        :param max_tool_calls: 所有會話同時執行的工具調用上限
+        :param max_session_tool_calls: 單一會話同時執行的工具調用上限
+        """
         self.hass = hass
+        self.linebot_mcp = LineBotMCP(hass)
         self._server: Optional[Server] = None
+        self._options: Optional[InitializationOptions] = None
         self._lock = asyncio.Lock()
+        self.max_session_tool_calls = max_session_tool_calls
+        self._tool_semaphore = asyncio.Semaphore(max_tool_calls)
+        # MCP 會話 -> 該會話的工具調用 semaphore（會話結束後自動移除）
+        self._session_semaphores: WeakKeyDictionary[Any, asyncio.Semaphore] = WeakKeyDictionary()
         
     async def get_server(self) -> Server:
         """獲取或創建 server 實例"""
+        server, _ = await self.get_server_with_options()
+        return server
+
+    async def get_server_with_options(self) -> tuple[Server, InitializationOptions]:
+        """獲取 server 實例與初始化選項
+
+        初始化選項需讀取套件版本資訊，只在建立 server 時交由執行緒池計算一次，
+        之後每個會話共用同一份。
+        """
         async with self._lock:
             if self._server is None:
-                self._server = await self._create_server()
-            return self._server
+                server = await self._create_server()
+                self._options = await self.hass.async_add_executor_job(
+                    server.create_initialization_options  # Reads package for version info
+                )
+                self._server = server
+            return self._server, self._options
+
+    def invalidate(self) -> None:
+        """清除快取的 server 與初始化選項，下次使用時重新建立（現有會話不受影響）"""
+        self._server = None
+        self._options = None
+
+    def bots_changed(self) -> None:
+        """Bot 新增、移除或重新載入後重建工具定義"""
+        self.linebot_mcp.invalidate()
     
     async def _create_server(self) -> Server:
         """創建新的 server 實例"""
@@ -320,13 +551,58 @@ class MCPServerManager:
         @server.list_tools()
         async def list_tools() -> list[types.Tool]:
             """列出可用的 LINE Bot 工具"""
-            linebot_mcp = LineBotMCP(self.hass)
-            return linebot_mcp._get_tool_definitions
+            return self.linebot_mcp.get_tool_definitions()
 
         @server.call_tool()
         async def call_tool(tool_name: str, arguments: dict) -> Sequence[types.TextContent]:
             """處理工具調用"""
-            linebot_mcp = LineBotMCP(self.hass)
-            return await linebot_mcp.call_tool(tool_name, arguments)
+            return await self.linebot_mcp.call_tool(tool_name, arguments)
+
+        # mcp server 已會同時處理同一會話的多個請求，這裡限制同時執行的工具調用數量，
+        # 並讓工具調用可由 notifications/cancelled 取消（見 SessionManager.send）
+        call_tool_handler = server.request_handlers[types.CallToolRequest]
+
+        async def limited_call_tool(req: types.CallToolRequest) -> types.ServerResult:
+            """在並行上限內執行工具調用"""
+            # 在排隊與呼叫 LINE API 前先驗證參數，錯誤以 JSON-RPC error 回應
+            try:
+                self.linebot_mcp.validate_arguments(req.params.name, req.params.arguments or {})
+            except SchemaValidationError as e:
+                raise McpError(types.ErrorData(
+                    code=types.INVALID_PARAMS,
+                    message=f"Invalid arguments for {req.params.name}: {e}",
+                    data={"tool": req.params.name, "path": e.path},
+                )) from e
+
+            context = server.request_context
+            session_semaphore = self._get_session_semaphore(context.session)
+
+            async def run_tool_call() -> types.ServerResult:
+                async with session_semaphore, self._tool_semaphore:
+                    return await call_tool_handler(req)
+
+            task = self.hass.async_create_background_task(
+                run_tool_call(), f"linebot_mcp tool call {req.params.name}"
+            )
+            tool_calls = getattr(CURRENT_SESSION.get(), "tool_calls", {})
+            tool_calls[context.request_id] = task
+            try:
+                return await task
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                raise McpError(types.ErrorData(code=0, message="Request cancelled")) from None
+            finally:
+                tool_calls.pop(context.request_id, None)
+
+        server.request_handlers[types.CallToolRequest] = limited_call_tool
         
         return server
+
+    def _get_session_semaphore(self, session: Any) -> asyncio.Semaphore:
+        """獲取會話的工具調用 semaphore"""
+        if (semaphore := self._session_semaphores.get(session)) is None:
+            semaphore = self._session_semaphores[session] = asyncio.Semaphore(
+                self.max_session_tool_calls
+            )
+        return semaphore
@@ -1,26 +1,64 @@
 """Model Context Protocol sessions."""
 from __future__ import annotations
 
+import asyncio
 import logging
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
-from dataclasses import dataclass
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
 
-from anyio.streams.memory import MemoryObjectSendStream
+import anyio
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 from mcp import types
 
 from homeassistant.util import ulid as ulid_util
 
+from ..const import (
+    MCP_STREAM_BUFFER_SIZE,
+    MCP_BUFFER_TIMEOUT,
+    MCP_BUFFER_POLICY_BLOCK,
+    MCP_BUFFER_POLICY_REJECT,
+)
+
 
 _LOGGER = logging.getLogger(__name__)
 
+# 執行 MCP server 的傳輸層會話（server.run 內的任務皆繼承此值）
+CURRENT_SESSION: ContextVar[Any] = ContextVar("linebot_mcp_session", default=None)
+
+
+@dataclass(slots=True)
+class SessionStats:
+    """會話串流緩衝統計"""
+
+    max_inbound_depth: int = 0
+    max_outbound_depth: int = 0
+    full: int = 0
+    rejected: int = 0
+
+    def record_inbound(self, writer: MemoryObjectSendStream[Any]) -> None:
+        """記錄客戶端送入方向的緩衝深度"""
+        depth = writer.statistics().current_buffer_used
+        self.max_inbound_depth = max(self.max_inbound_depth, depth)
+
+    def record_outbound(self, writer: MemoryObjectSendStream[Any]) -> None:
+        """記錄伺服器送出方向的緩衝深度"""
+        depth = writer.statistics().current_buffer_used
+        self.max_outbound_depth = max(self.max_outbound_depth, depth)
+
 
 @dataclass
 class Session:
     """A session for the Model Context Protocol."""
 
     read_stream_writer: MemoryObjectSendStream[types.JSONRPCMessage | Exception]
-    
+    write_stream_writer: Optional[MemoryObjectSendStream[types.JSONRPCMessage]] = None
+    stats: SessionStats = field(default_factory=SessionStats)
+    # JSON-RPC 請求 ID -> 執行中的工具調用
+    tool_calls: dict[types.RequestId, asyncio.Task] = field(default_factory=dict)
+
     def close(self) -> None:
         """關閉會話"""
         try:
@@ -32,9 +70,71 @@ class Session:
 class SessionManager:
     """管理 MCP 傳輸層的 SSE 會話"""
 
-    def __init__(self) -> None:
-        """初始化 SSE 服務器傳輸"""
+    def __init__(
+        self,
+        buffer_size: int = MCP_STREAM_BUFFER_SIZE,
+        full_policy: str = MCP_BUFFER_POLICY_BLOCK,
+        send_timeout: float = MCP_BUFFER_TIMEOUT,
+    ) -> None:
+        """初始化 SSE 服務器傳輸
+
+        :param buffer_size: 每個會話每個方向的串流緩衝大小
+        :param full_policy: 緩衝區已滿時等待（block）或立即拒絕（reject）
+        :param send_timeout: block 策略下等待緩衝區空位的秒數
+        """
         self._sessions: dict[str, Session] = {}
+        self.buffer_size = buffer_size
+        self.full_policy = full_policy
+        self.send_timeout = send_timeout
+
+    def create_streams(
+        self,
+    ) -> tuple[MemoryObjectSendStream[Any], MemoryObjectReceiveStream[Any]]:
+        """建立有緩衝的會話串流"""
+        return anyio.create_memory_object_stream(self.buffer_size)
+
+    async def send(self, session: Any, message: types.JSONRPCMessage) -> bool:
+        """將客戶端訊息送入會話，緩衝區已滿時依策略處理，被拒絕時回傳 False"""
+        if self._cancel_tool_call(session, message):
+            return True
+
+        writer = session.read_stream_writer
+        try:
+            writer.send_nowait(message)
+        except anyio.WouldBlock:
+            session.stats.full += 1
+            if self.full_policy == MCP_BUFFER_POLICY_REJECT:
+                session.stats.rejected += 1
+                return False
+            try:
+                with anyio.fail_after(self.send_timeout):
+                    await writer.send(message)
+            except TimeoutError:
+                session.stats.rejected += 1
+                return False
+
+        session.stats.record_inbound(writer)
+        return True
+
+    @staticmethod
+    def _cancel_tool_call(session: Any, message: types.JSONRPCMessage) -> bool:
+        """處理 notifications/cancelled，是取消通知時回傳 True
+
+        mcp 1.5.0 取消請求時會連同整個 server.run 一起結束，
+        因此取消通知不轉交給 mcp server，改為直接取消執行中的工具調用。
+        """
+        root = message.root
+        if not (
+            isinstance(root, types.JSONRPCNotification)
+            and root.method == "notifications/cancelled"
+        ):
+            return False
+
+        request_id = (root.params or {}).get("requestId")
+        if (task := session.tool_calls.get(request_id)) is not None:
+            _LOGGER.debug(f"Cancelling tool call {request_id}")
+            task.cancel()
+        return True
 
     @asynccontextmanager
     async def create(self, session: Session) -> AsyncGenerator[str, None]:
@@ -45,11 +145,26 @@ class SessionManager:
         try:
             yield session_id
         finally:
-            _LOGGER.debug(f"Closing session: {session_id}")
+            _LOGGER.debug(f"Closing session: {session_id} {self._session_stats(session)}")
             session = self._sessions.pop(session_id, None)
             if session:
                 session.close()
 
+    def add(self, session: Any) -> str:
+        """加入不受請求生命週期限制的會話（Streamable HTTP），回傳會話 ID"""
+        session_id = ulid_util.ulid_now()
+        _LOGGER.debug(f"Adding session: {session_id}")
+        self._sessions[session_id] = session
+        return session_id
+
+    def remove(self, session_id: str) -> bool:
+        """移除並關閉會話，找不到時回傳 False"""
+        if (session := self._sessions.pop(session_id, None)) is None:
+            return False
+        _LOGGER.debug(f"Removing session: {session_id} {self._session_stats(session)}")
+        session.close()
+        return True
+
     def get(self, session_id: str) -> Session | None:
         """獲取現有會話"""
         session = self._sessions.get(session_id)
@@ -59,6 +174,28 @@ class SessionManager:
         """獲取活躍會話數量"""
         return len(self._sessions)
 
+    @property
+    def stats(self) -> dict[str, dict[str, int]]:
+        """各會話的串流緩衝統計"""
+        return {
+            session_id: self._session_stats(session)
+            for session_id, session in self._sessions.items()
+        }
+
+    @staticmethod
+    def _session_stats(session: Any) -> dict[str, int]:
+        """單一會話的串流緩衝統計"""
+        stats = {
+            "inbound_depth": session.read_stream_writer.statistics().current_buffer_used,
+            "max_inbound_depth": session.stats.max_inbound_depth,
+            "max_outbound_depth": session.stats.max_outbound_depth,
+            "full": session.stats.full,
+            "rejected": session.stats.rejected,
+        }
+        if (writer := session.write_stream_writer) is not None:
+            stats["outbound_depth"] = writer.statistics().current_buffer_used
+        return stats
+
     def close(self) -> None:
         """關閉所有開放的會話"""
         for session in self._sessions.values():
@@ -0,0 +1,225 @@
+"""LINE Bot MCP Streamable HTTP 會話."""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+from collections import deque
+from collections.abc import AsyncGenerator, Callable, Iterable
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import anyio
+from mcp import types
+from mcp.server import Server
+
+from homeassistant.core import HomeAssistant
+
+from ..const import (
+    MCP_SESSION_IDLE_TIMEOUT,
+    MCP_EVENT_BUFFER_SIZE,
+    MCP_STREAM_BUFFER_SIZE,
+)
+from .session import CURRENT_SESSION, SessionStats
+
+
+_LOGGER = logging.getLogger(__name__)
+
+MCP_SESSION_ID_HEADER = "Mcp-Session-Id"
+LAST_EVENT_ID_HEADER = "Last-Event-ID"
+# GET 開啟的串流，接收與請求無關的伺服器訊息
+STANDALONE_STREAM = "0"
+
+
+@dataclass(slots=True)
+class StoredEvent:
+    """已送出的 SSE 事件（保留供續傳）"""
+
+    seq: int
+    stream_id: str
+    message: types.JSONRPCMessage
+
+    @property
+    def event_id(self) -> str:
+        """SSE 事件 ID（含串流 ID，可由 Last-Event-ID 找回所屬串流）"""
+        return f"{self.stream_id}/{self.seq}"
+
+
+class StreamableHTTPSession:
+    """單一 Streamable HTTP 客戶端的 MCP 會話.
+
+    MCP server 在背景持續執行，跨多個 HTTP 請求保留初始化狀態；
+    回應依 JSON-RPC 請求 ID 分派給送出該請求的 HTTP 回應，
+    最近的事件保留在緩衝區，斷線後可用 Last-Event-ID 續傳。
+    閒置超過 MCP_SESSION_IDLE_TIMEOUT 秒且沒有開啟的串流時自動關閉。
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = MCP_STREAM_BUFFER_SIZE,
+        event_buffer_size: int = MCP_EVENT_BUFFER_SIZE,
+    ) -> None:
+        """初始化會話
+
+        :param buffer_size: 每個方向的串流緩衝大小
+        :param event_buffer_size: 保留供續傳的事件數
+        """
+        self.read_stream_writer, self._read_stream_reader = anyio.create_memory_object_stream(buffer_size)
+        self.write_stream_writer, self._write_stream_reader = anyio.create_memory_object_stream(buffer_size)
+        self.stats = SessionStats()
+        # JSON-RPC 請求 ID -> 執行中的工具調用
+        self.tool_calls: dict[types.RequestId, asyncio.Task] = {}
+        self._events: deque[StoredEvent] = deque(maxlen=event_buffer_size)
+        self._event_seq = itertools.count(1)
+        self._stream_seq = itertools.count(1)
+        # 串流 ID -> 開啟中的 HTTP 回應佇列（None 表示會話已關閉）
+        self._streams: dict[str, asyncio.Queue[Optional[StoredEvent]]] = {}
+        # JSON-RPC 請求 ID -> 等待回應的串流 ID
+        self._request_streams: dict[types.RequestId, str] = {}
+        self._hass: Optional[HomeAssistant] = None
+        self._on_idle: Optional[Callable[[], None]] = None
+        self._idle_timer: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def start(
+        self,
+        hass: HomeAssistant,
+        server: Server[Any],
+        options: Any,
+        on_idle: Callable[[], None],
+    ) -> None:
+        """在背景執行 MCP server"""
+        self._hass = hass
+        self._on_idle = on_idle
+        self._task = hass.async_create_background_task(
+            self._run(server, options), "linebot_mcp streamable http session"
+        )
+        self.touch()
+
+    async def _run(self, server: Server[Any], options: Any) -> None:
+        """運行 MCP 伺服器並分派其送出的訊息"""
+        CURRENT_SESSION.set(self)
+        try:
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(self._route_messages)
+                await server.run(self._read_stream_reader, self.write_stream_writer, options)
+        except anyio.get_cancelled_exc_class():
+            _LOGGER.debug("Streamable HTTP session cancelled")
+            raise
+        except Exception as e:
+            _LOGGER.debug(f"Streamable HTTP session error: {e}")
+        finally:
+            self._close_streams()
+
+    async def _route_messages(self) -> None:
+        """將伺服器訊息存入緩衝區並轉交給對應的串流"""
+        async for message in self._write_stream_reader:
+            self.stats.record_outbound(self.write_stream_writer)
+            root = message.root
+            stream_id = None
+            if isinstance(root, (types.JSONRPCResponse, types.JSONRPCError)):
+                stream_id = self._request_streams.pop(root.id, None)
+
+            event = StoredEvent(next(self._event_seq), stream_id or STANDALONE_STREAM, message)
+            self._events.append(event)
+            if (queue := self._streams.get(event.stream_id)) is not None:
+                queue.put_nowait(event)
+
+    def touch(self) -> None:
+        """重設閒置計時"""
+        if self._hass is None or self._closed:
+            return
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        self._idle_timer = self._hass.loop.call_later(
+            MCP_SESSION_IDLE_TIMEOUT, self._handle_idle
+        )
+
+    def _handle_idle(self) -> None:
+        """閒置逾時，仍有開啟的串流時延後"""
+        self._idle_timer = None
+        if self._streams:
+            self.touch()
+            return
+        _LOGGER.debug("Closing idle streamable HTTP session")
+        if self._on_idle is not None:
+            self._on_idle()
+
+    def open_stream(
+        self, request_ids: Iterable[types.RequestId]
+    ) -> tuple[str, asyncio.Queue[Optional[StoredEvent]]]:
+        """為 POST 請求開啟串流，接收其中請求的回應"""
+        stream_id = str(next(self._stream_seq))
+        queue = self._streams[stream_id] = asyncio.Queue()
+        for request_id in request_ids:
+            self._request_streams[request_id] = stream_id
+        return stream_id, queue
+
+    def discard_requests(self, request_ids: Iterable[types.RequestId]) -> None:
+        """移除不會有回應的請求（未送入伺服器）"""
+        for request_id in request_ids:
+            self._request_streams.pop(request_id, None)
+
+    def open_standalone_stream(self) -> Optional[asyncio.Queue[Optional[StoredEvent]]]:
+        """開啟 GET 串流，已開啟時回傳 None"""
+        if STANDALONE_STREAM in self._streams:
+            return None
+        queue = self._streams[STANDALONE_STREAM] = asyncio.Queue()
+        return queue
+
+    def resume_stream(
+        self, last_event_id: str
+    ) -> Optional[tuple[str, asyncio.Queue[Optional[StoredEvent]], list[StoredEvent]]]:
+        """續傳 Last-Event-ID 之後的事件，串流仍開啟時回傳 None.
+
+        :raises ValueError: 事件 ID 格式錯誤
+        """
+        stream_id, _, seq = last_event_id.partition("/")
+        last_seq = int(seq)
+        if stream_id in self._streams:
+            return None
+
+        queue = self._streams[stream_id] = asyncio.Queue()
+        replay = [
+            event for event in self._events
+            if event.stream_id == stream_id and event.seq > last_seq
+        ]
+        return stream_id, queue, replay
+
+    def close_stream(self, stream_id: str) -> None:
+        """關閉串流（尚未送達的回應仍保留在緩衝區）"""
+        self._streams.pop(stream_id, None)
+        self.touch()
+
+    async def iter_stream(
+        self,
+        stream_id: str,
+        queue: asyncio.Queue[Optional[StoredEvent]],
+    ) -> AsyncGenerator[StoredEvent, None]:
+        """逐一取得串流事件，直到串流中的請求都已回應"""
+        while not queue.empty() or self._has_pending(stream_id):
+            if (event := await queue.get()) is None:
+                return
+            yield event
+
+    def _has_pending(self, stream_id: str) -> bool:
+        """串流是否仍有未回應的請求（GET 串流持續開啟）"""
+        return stream_id == STANDALONE_STREAM or stream_id in self._request_streams.values()
+
+    def _close_streams(self) -> None:
+        """通知所有開啟的串流結束"""
+        for queue in self._streams.values():
+            queue.put_nowait(None)
+
+    def close(self) -> None:
+        """關閉會話"""
+        self._closed = True
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        try:
+            self.read_stream_writer.close()
+        except Exception as e:
+            _LOGGER.warning(f"Error closing session stream: {e}")
+        self._close_streams()
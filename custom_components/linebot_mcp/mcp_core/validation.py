@@ -0,0 +1,201 @@
+"""MCP 工具參數驗證.
+
+將工具的 JSON Schema（僅支援工具定義實際使用的關鍵字）預先編譯成驗證函式，
+在呼叫 LINE API 前就能回報格式錯誤的位置。
+"""
+from __future__ import annotations
+
+import re
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+# (值, 路徑)
+Validator = Callable[[Any, str], None]
+
+_JSON_TYPES: dict[str, type | tuple[type, ...]] = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+}
+
+
+class SchemaValidationError(ValueError):
+    """參數不符合 schema"""
+
+    def __init__(self, path: str, message: str) -> None:
+        super().__init__(f"{path}: {message}" if path else message)
+        self.path = path
+
+
+def compile_schema(schema: dict[str, Any]) -> Callable[[Any], None]:
+    """編譯 JSON Schema，回傳驗證函式（不符合時引發 SchemaValidationError）"""
+    validator = _compile(schema)
+
+    def validate(value: Any) -> None:
+        validator(value, "")
+
+    return validate
+
+
+def _child_path(path: str, key: str | int) -> str:
+    """子欄位路徑，例如 messages[0].text"""
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    return f"{path}.{key}" if path else key
+
+
+def _compile(schema: dict[str, Any]) -> Validator:
+    """依序組合 schema 中各關鍵字的檢查"""
+    checks: list[Validator] = []
+
+    if (expected := schema.get("type")) is not None:
+        checks.append(_compile_type(expected))
+    if "enum" in schema:
+        checks.append(_compile_enum(schema["enum"]))
+    if "pattern" in schema:
+        checks.append(_compile_pattern(schema["pattern"]))
+    if "maxLength" in schema:
+        checks.append(_compile_max_length(schema["maxLength"]))
+    if "minItems" in schema or "maxItems" in schema:
+        checks.append(_compile_items_count(schema.get("minItems"), schema.get("maxItems")))
+    if "items" in schema:
+        checks.append(_compile_items(schema["items"]))
+    if "properties" in schema or "required" in schema:
+        checks.append(_compile_properties(schema.get("properties", {}), schema.get("required", ())))
+    if "oneOf" in schema:
+        checks.append(_compile_one_of(schema["oneOf"]))
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def validate(value: Any, path: str) -> None:
+        for check in checks:
+            check(value, path)
+
+    return validate
+
+
+def _compile_type(expected: str) -> Validator:
+    python_type = _JSON_TYPES[expected]
+    # bool 是 int 的子類別，不可當作數字
+    reject_bool = expected in ("number", "integer")
+
+    def validate(value: Any, path: str) -> None:
+        if not isinstance(value, python_type) or (reject_bool and isinstance(value, bool)):
+            raise SchemaValidationError(path, f"expected {expected}, got {type(value).__name__}")
+
+    return validate
+
+
+def _compile_enum(options: list[Any]) -> Validator:
+    allowed = frozenset(options)
+    expected = ", ".join(str(option) for option in options)
+
+    def validate(value: Any, path: str) -> None:
+        # list / dict 無法查表，同樣視為不在選項中
+        if not isinstance(value, Hashable) or value not in allowed:
+            raise SchemaValidationError(path, f"must be one of {expected}")
+
+    return validate
+
+
+def _compile_pattern(pattern: str) -> Validator:
+    regex = re.compile(pattern)
+
+    def validate(value: Any, path: str) -> None:
+        if isinstance(value, str) and regex.search(value) is None:
+            raise SchemaValidationError(path, f"does not match {pattern}")
+
+    return validate
+
+
+def _compile_max_length(max_length: int) -> Validator:
+    def validate(value: Any, path: str) -> None:
+        if isinstance(value, str) and len(value) > max_length:
+            raise SchemaValidationError(path, f"longer than {max_length} characters")
+
+    return validate
+
+
+def _compile_items_count(min_items: int | None, max_items: int | None) -> Validator:
+    def validate(value: Any, path: str) -> None:
+        if not isinstance(value, list):
+            return
+        if min_items is not None and len(value) < min_items:
+            raise SchemaValidationError(path, f"needs at least {min_items} item(s)")
+        if max_items is not None and len(value) > max_items:
+            raise SchemaValidationError(path, f"allows at most {max_items} item(s), got {len(value)}")
+
+    return validate
+
+
+def _compile_items(items: dict[str, Any]) -> Validator:
+    item_validator = _compile(items)
+
+    def validate(value: Any, path: str) -> None:
+        if isinstance(value, list):
+            for index, item in enumerate(value):
+                item_validator(item, _child_path(path, index))
+
+    return validate
+
+
+def _compile_properties(properties: dict[str, Any], required: list[str]) -> Validator:
+    required = tuple(required)
+    validators = {name: _compile(schema) for name, schema in properties.items()}
+
+    def validate(value: Any, path: str) -> None:
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                raise SchemaValidationError(_child_path(path, name), "is required")
+        for name, validator in validators.items():
+            if name in value:
+                validator(value[name], _child_path(path, name))
+
+    return validate
+
+
+def _compile_one_of(branches: list[dict[str, Any]]) -> Validator:
+    """oneOf；各分支以 type 欄位的固定值區分時直接查表"""
+    discriminators = [
+        branch.get("properties", {}).get("type", {}).get("enum") for branch in branches
+    ]
+    if all(enum and len(enum) == 1 for enum in discriminators):
+        by_type = {enum[0]: _compile(branch) for enum, branch in zip(discriminators, branches)}
+        expected = ", ".join(by_type)
+
+        def validate_by_type(value: Any, path: str) -> None:
+            if not isinstance(value, dict):
+                return
+            discriminator = value.get("type")
+            if (
+                not isinstance(discriminator, Hashable)
+                or (validator := by_type.get(discriminator)) is None
+            ):
+                raise SchemaValidationError(
+                    _child_path(path, "type"), f"must be one of {expected}"
+                )
+            validator(value, path)
+
+        return validate_by_type
+
+    validators = [_compile(branch) for branch in branches]
+
+    def validate(value: Any, path: str) -> None:
+        matched = 0
+        for validator in validators:
+            try:
+                validator(value, path)
+            except SchemaValidationError:
+                continue
+            matched += 1
+        if matched != 1:
+            raise SchemaValidationError(path, f"must match exactly one schema, matched {matched}")
+
+    return validate
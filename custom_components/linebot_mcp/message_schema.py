@@ -0,0 +1,241 @@
+"""LINE 訊息格式 JSON Schema（MCP 工具與自動回覆共用）."""
+from __future__ import annotations
+
+import json
+import logging
+from functools import lru_cache
+from typing import Any
+
+from .line_api_client import create_text_message
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# LINE 單次發送最多訊息數
+LINE_MAX_MESSAGES = 5
+
+# LINE 文字訊息最大長度
+LINE_TEXT_MAX_LENGTH = 5000
+
+# 單則 LINE 訊息
+LINE_MESSAGE_SCHEMA: dict = {
+    "type": "object",
+    "description": "LINE message: text, image, or location",
+    "oneOf": [
+        {
+            "properties": {
+                "type": {
+                    "type": "string",
+                    "enum": ["text"],
+                    "description": "Text message"
+                },
+                "text": {
+                    "type": "string",
+                    "description": "Message content",
+                    "maxLength": 5000
+                }
+            },
+            "required": ["type", "text"]
+        },
+        {
+            "properties": {
+                "type": {
+                    "type": "string",
+                    "enum": ["image"],
+                    "description": "Image message"
+                },
+                "originalContentUrl": {
+                    "type": "string",
+                    "format": "uri",
+                    "description": "HTTPS URL of original image (JPEG/PNG, max 10MB)",
+                    "maxLength": 2000
+                },
+                "previewImageUrl": {
+                    "type": "string",
+                    "format": "uri",
+                    "description": "HTTPS URL of preview image (max 1MB)",
+                    "maxLength": 2000
+                }
+            },
+            "required": ["type", "originalContentUrl", "previewImageUrl"]
+        },
+        {
+            "properties": {
+                "type": {
+                    "type": "string",
+                    "enum": ["location"],
+                    "description": "Location message"
+                },
+                "title": {
+                    "type": "string",
+                    "description": "Location title/label"
+                },
+                "address": {
+                    "type": "string",
+                    "description": "Full address"
+                },
+                "latitude": {
+                    "type": "number",
+                    "description": "Latitude coordinate"
+                },
+                "longitude": {
+                    "type": "number",
+                    "description": "Longitude coordinate"
+                }
+            },
+            "required": ["type", "address", "latitude", "longitude"]
+        }
+    ]
+}
+
+# 自動回覆要求對話代理輸出的格式
+REPLY_SCHEMA: dict = {
+    "type": "object",
+    "properties": {
+        "messages": {
+            "type": "array",
+            "description": "Array of messages to send",
+            "items": LINE_MESSAGE_SCHEMA,
+            "minItems": 1,
+            "maxItems": LINE_MAX_MESSAGES,
+        }
+    },
+    "required": ["messages"],
+}
+
+# 自動回覆允許的訊息類型 -> 必填欄位
+REPLY_MESSAGE_REQUIRED_FIELDS: dict[str, tuple[str, ...]] = {
+    variant["properties"]["type"]["enum"][0]: tuple(variant["required"])
+    for variant in LINE_MESSAGE_SCHEMA["oneOf"]
+}
+
+# 精簡序列化，減少每次送給對話代理的 token 數
+REPLY_SCHEMA_JSON = json.dumps(REPLY_SCHEMA, separators=(",", ":"), ensure_ascii=False)
+
+DEFAULT_AUTO_REPLY_PROMPT = (
+    "Answer using the structured format defined in the JSON Schema below."
+)
+AUTO_REPLY_FORMAT_REMINDER = (
+    "Answer using the same JSON format as before."
+)
+
+
+@lru_cache(maxsize=8)
+def _schema_prompt(instructions: str) -> str:
+    """組合說明與 schema"""
+    return f"{instructions}\n{REPLY_SCHEMA_JSON}"
+
+
+def build_auto_reply_prompt(
+    text: str,
+    instructions: str = DEFAULT_AUTO_REPLY_PROMPT,
+    include_schema: bool = True,
+    history: str = "",
+) -> str:
+    """產生自動回覆送給對話代理的內容.
+
+    :param include_schema: 是否附上回覆格式 schema（否則僅提醒沿用先前格式）
+    :param history: 近期對話摘要（對話代理開啟新對話時使用）
+    """
+    suffix = _schema_prompt(instructions) if include_schema else AUTO_REPLY_FORMAT_REMINDER
+    if history:
+        return f"Recent conversation:\n{history}\nUser's message: {text}\n{suffix}"
+    return f"User's message: {text}\n{suffix}"
+
+
+def _scan_json_objects(text: str) -> tuple[list[str], list[tuple[int, int, int, int]]]:
+    """單次掃描找出所有括號平衡的 "{...}" 候選物件.
+
+    掃描時略過字串內容（僅在括號內辨識字串），並順便移除 "}"、"]" 前多餘的逗號；
+    未閉合的括號不會影響之後的物件。
+    回傳 (清理後的字元, [(開始位置, 字元起點, 字元終點, 結束位置)])，依開始位置排序。
+    """
+    out: list[str] = []
+    # (括號, 字元起點, 開始位置)
+    stack: list[tuple[str, int, int]] = []
+    candidates: list[tuple[int, int, int, int]] = []
+    in_string = False
+    escaped = False
+
+    for index, char in enumerate(text):
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"' and stack:
+            in_string = True
+        elif char in "{[":
+            stack.append((char, len(out), index))
+        elif char in "}]" and stack:
+            # 修正 LLM 常見的結尾逗號
+            last = len(out) - 1
+            while last >= 0 and out[last].isspace():
+                last -= 1
+            if last >= 0 and out[last] == ",":
+                del out[last]
+
+            opener, out_start, start = stack.pop()
+            out.append(char)
+            if opener == "{" and char == "}":
+                candidates.append((start, out_start, len(out), index + 1))
+            continue
+
+        out.append(char)
+
+    candidates.sort()
+    return out, candidates
+
+
+def validate_reply_messages(messages: list[Any]) -> list[dict[str, Any]]:
+    """依回覆格式 schema 過濾訊息，並截斷至 LINE 的限制."""
+    valid = []
+    for message in messages:
+        if not isinstance(message, dict):
+            continue
+        required = REPLY_MESSAGE_REQUIRED_FIELDS.get(message.get("type"))
+        if required is None or any(message.get(key) in (None, "") for key in required):
+            continue
+        if message["type"] == "text":
+            message["text"] = str(message["text"])[:LINE_TEXT_MAX_LENGTH]
+        valid.append(message)
+
+    if len(valid) > LINE_MAX_MESSAGES:
+        _LOGGER.debug(f"Truncated auto reply from {len(valid)} to {LINE_MAX_MESSAGES} messages")
+    return valid[:LINE_MAX_MESSAGES]
+
+
+def extract_reply_messages(speech: str) -> list[dict[str, Any]]:
+    """從對話代理的回應中取出 LINE 訊息.
+
+    找出第一個可解析且符合回覆格式的 JSON 物件（前後可有其他文字或
+    程式碼區塊標記）；找不到時將整段內容包裝成文字訊息。
+    """
+    text = speech.strip()
+    out, candidates = _scan_json_objects(text)
+
+    resume = 0
+    for start, out_start, out_end, end in candidates:
+        # 略過已解析但不符合格式的物件內的巢狀物件
+        if start < resume:
+            continue
+
+        try:
+            result = json.loads("".join(out[out_start:out_end]))
+        except json.JSONDecodeError:
+            # 可能是說明文字中的括號，改試下一個物件
+            continue
+
+        # 缺少 messages 時視為單則訊息
+        messages = result.get("messages", [result])
+        if isinstance(messages, list) and (valid := validate_reply_messages(messages)):
+            return valid
+
+        resume = end
+
+    return [create_text_message(text[:LINE_TEXT_MAX_LENGTH])]
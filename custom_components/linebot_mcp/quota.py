@@ -0,0 +1,157 @@
+"""LINE 訊息配額本地帳本."""
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+from datetime import datetime
+from typing import Optional
+
+from homeassistant.util import dt as dt_util
+
+from .const import LINE_QUOTA_TIMEZONE
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _current_period() -> tuple[int, int]:
+    """目前的配額月份（LINE 以日本時間每月 1 日重置）"""
+    now = dt_util.now(dt_util.get_time_zone(LINE_QUOTA_TIMEZONE))
+    return now.year, now.month
+
+
+def next_period_start() -> datetime:
+    """下一個配額月份的開始時間（日本時間下個月 1 日 0 時）"""
+    now = dt_util.now(dt_util.get_time_zone(LINE_QUOTA_TIMEZONE))
+    if now.month == 12:
+        return now.replace(year=now.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    return now.replace(month=now.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class QuotaLedger:
+    """在兩次與 LINE 對帳之間，以成功發送的收件者數累計本月用量.
+
+    reply 不計入配額；push 計為 1 則（群組與聊天室實際依成員數計算，對帳時修正）；
+    multicast 依收件者數計算；broadcast 與 narrowcast 的收件者數無法在本地得知，
+    只標記為需要盡快對帳。發送前以 admit 預估是否會超出本月配額。
+    """
+
+    def __init__(self) -> None:
+        """初始化帳本."""
+        self.limit_type: Optional[str] = None
+        self.limit: Optional[int] = None
+        # 最近一次對帳時 LINE 回報的用量
+        self.reconciled_usage: Optional[int] = None
+        # 對帳後本地累計的用量
+        self.local_usage = 0
+        # 對帳後無法得知收件者數的發送次數
+        self.unknown_sends = 0
+        self.sends_since_reconcile = 0
+        self._period: Optional[tuple[int, int]] = None
+        # LINE 回報本月配額已用盡的月份
+        self._exhausted_period: Optional[tuple[int, int]] = None
+        self._listeners: list[Callable[[], None]] = []
+
+    @property
+    def usage(self) -> Optional[int]:
+        """目前估計的本月用量，尚未對帳時為 None"""
+        if self.reconciled_usage is None:
+            return None
+        self._check_period()
+        return self.reconciled_usage + self.local_usage
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """估計的剩餘配額，無上限或尚未對帳時為 None"""
+        if self._exhausted_period == _current_period():
+            return 0
+        if self.limit_type != "limited" or self.limit is None or (usage := self.usage) is None:
+            return None
+        return max(self.limit - usage, 0)
+
+    @property
+    def active(self) -> bool:
+        """上次對帳後是否有發送"""
+        return self.sends_since_reconcile > 0
+
+    @property
+    def needs_reconcile(self) -> bool:
+        """是否有無法在本地計算的用量"""
+        return self.unknown_sends > 0
+
+    def admit(self, recipients: Optional[int]) -> bool:
+        """預估發送後是否仍在配額內（無上限或尚未對帳時一律允許）
+
+        :param recipients: 收件者數，無法得知時為 None（至少需剩餘 1 則）
+        """
+        if (remaining := self.remaining) is None:
+            return True
+        return remaining >= (recipients or 1)
+
+    def mark_exhausted(self) -> None:
+        """LINE 回報本月配額已用盡，下次對帳或跨月前不再允許發送"""
+        self._exhausted_period = _current_period()
+
+    def roll_over(self) -> None:
+        """配額月份開始時呼叫，重置上個月累計的用量並通知"""
+        if self._check_period():
+            self._notify()
+
+    def add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """註冊用量變更通知，回傳取消註冊的函式"""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def record(self, recipients: Optional[int]) -> None:
+        """記錄一次成功的發送.
+
+        :param recipients: 收件者數，無法得知時為 None
+        """
+        self._check_period()
+
+        self.sends_since_reconcile += 1
+        if recipients is None:
+            self.unknown_sends += 1
+        else:
+            self.local_usage += recipients
+
+        self._notify()
+
+    def reconcile(
+        self,
+        limit_type: Optional[str],
+        limit: Optional[int],
+        total_usage: Optional[int],
+        counted: int = 0,
+    ) -> None:
+        """以 LINE 回報的配額與用量校正帳本.
+
+        :param counted: 查詢開始時的本地用量（查詢期間的發送仍保留）
+        """
+        self.limit_type = limit_type
+        self.limit = limit
+        self.reconciled_usage = total_usage or 0
+        self.local_usage = max(self.local_usage - counted, 0)
+        self.unknown_sends = 0
+        self.sends_since_reconcile = 0
+        self._period = _current_period()
+        self._exhausted_period = None
+        _LOGGER.debug(
+            f"Quota reconciled: {self.reconciled_usage}/{limit if limit_type == 'limited' else 'unlimited'}"
+        )
+        self._notify()
+
+    def _check_period(self) -> bool:
+        """跨月時 LINE 端用量已重置，先前累計的用量不再計入；有重置時回傳 True"""
+        if self._period is None or self._period == (period := _current_period()):
+            return False
+        self.reconciled_usage = 0
+        self.local_usage = 0
+        self.unknown_sends = 0
+        self._period = period
+        return True
+
+    def _notify(self) -> None:
+        """通知用量或配額變更"""
+        for listener in self._listeners:
+            listener()
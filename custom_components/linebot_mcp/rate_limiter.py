@@ -0,0 +1,129 @@
+"""LINE API 端點速率限制器."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from .const import (
+    LINE_API_RATE_LIMITS,
+    LINE_API_DEFAULT_RATE_LIMIT,
+)
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """非同步 token bucket.
+
+    取不到 token 的呼叫者會依到達順序排隊等待，而不是直接失敗。
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """初始化 token bucket.
+
+        :param rate: 每秒補充的 token 數
+        :param capacity: bucket 容量（允許的突發請求數）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = 0
+        # asyncio.Lock 依 FIFO 喚醒，確保排隊順序
+        self._lock = asyncio.Lock()
+
+    @property
+    def tokens(self) -> float:
+        """目前可用的 token 數"""
+        self._refill(time.monotonic())
+        return self._tokens
+
+    @property
+    def waiters(self) -> int:
+        """正在排隊等待的呼叫者數量"""
+        return self._waiters
+
+    def _refill(self, now: float) -> None:
+        """依經過時間補充 token."""
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    async def acquire(self) -> None:
+        """取得一個 token，不足時等待."""
+        self._waiters += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self._blocked_until:
+                        await asyncio.sleep(self._blocked_until - now)
+                        continue
+
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+        finally:
+            self._waiters -= 1
+
+    def limit_remaining(self, remaining: int) -> None:
+        """依伺服器回報的剩餘次數收斂可用 token."""
+        self._refill(time.monotonic())
+        self._tokens = min(self._tokens, float(max(remaining, 0)))
+
+    def block(self, seconds: float) -> None:
+        """清空 token 並暫停指定秒數（收到 429 時使用）."""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = 0.0
+        # 暫停期間不累積 token
+        self._updated = self._blocked_until
+
+
+class EndpointRateLimiter:
+    """依 LINE API 端點分別限速."""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        default: Tuple[float, float] = LINE_API_DEFAULT_RATE_LIMIT,
+    ) -> None:
+        """初始化速率限制器."""
+        self._limits = LINE_API_RATE_LIMITS if limits is None else limits
+        self._default = default
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _get_bucket(self, endpoint: str) -> TokenBucket:
+        """取得端點對應的 bucket，未定義的端點共用預設 bucket."""
+        key = endpoint if endpoint in self._limits else None
+        if (bucket := self._buckets.get(key)) is None:
+            rate, capacity = self._limits.get(key, self._default)
+            bucket = self._buckets[key] = TokenBucket(rate, capacity)
+        return bucket
+
+    async def acquire(self, endpoint: str) -> None:
+        """等待端點的發送額度."""
+        bucket = self._get_bucket(endpoint)
+        if bucket.waiters or bucket.tokens < 1:
+            _LOGGER.debug(
+                f"Rate limit reached for {endpoint}, queued behind {bucket.waiters} request(s)"
+            )
+        await bucket.acquire()
+
+    def update(self, endpoint: str, remaining: Optional[int]) -> None:
+        """依 x-line-rate-limit-remaining 標頭調整 bucket."""
+        if remaining is not None:
+            self._get_bucket(endpoint).limit_remaining(remaining)
+
+    def block(self, endpoint: str, seconds: float) -> None:
+        """暫停端點發送."""
+        _LOGGER.warning(f"Rate limited by LINE on {endpoint}, pausing for {seconds:.1f}s")
+        self._get_bucket(endpoint).block(seconds)
@@ -0,0 +1,81 @@
+"""LINE reply token 有效期限追蹤."""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from .const import (
+    REPLY_TOKEN_LIFETIME,
+    REPLY_TOKEN_MAX_TRACKED,
+)
+
+
+@dataclass(slots=True)
+class ReplyTokenInfo:
+    """Reply token 資訊."""
+
+    deadline: float
+    target: Optional[str]
+
+    @property
+    def remaining(self) -> float:
+        """剩餘有效秒數"""
+        return self.deadline - time.time()
+
+
+class ReplyTokenTracker:
+    """記錄 webhook 收到的 reply token 及其到期時間與來源.
+
+    到期時間以事件時間戳計算（若晚於本地接收時間則以接收時間為準），
+    來源（群組、聊天室或用戶 ID）供 token 過期時改用 push 發送。
+    """
+
+    def __init__(
+        self,
+        lifetime: float = REPLY_TOKEN_LIFETIME,
+        max_tracked: int = REPLY_TOKEN_MAX_TRACKED,
+    ) -> None:
+        """初始化追蹤器."""
+        self.lifetime = lifetime
+        self.max_tracked = max_tracked
+        self._tokens: OrderedDict[str, ReplyTokenInfo] = OrderedDict()
+
+    def register(
+        self,
+        reply_token: Optional[str],
+        timestamp: Optional[int],
+        target: Optional[str],
+    ) -> Optional[ReplyTokenInfo]:
+        """登記 reply token.
+
+        :param timestamp: webhook 事件時間戳（毫秒）
+        :param target: token 失效時改用 push 的目標 ID
+        """
+        if not reply_token:
+            return None
+
+        now = time.time()
+        issued = min(now, timestamp / 1000) if timestamp else now
+        info = ReplyTokenInfo(deadline=issued + self.lifetime, target=target)
+
+        self._prune(now)
+        self._tokens[reply_token] = info
+        return info
+
+    def get(self, reply_token: str) -> Optional[ReplyTokenInfo]:
+        """取得 reply token 資訊."""
+        return self._tokens.get(reply_token)
+
+    def consume(self, reply_token: str) -> None:
+        """移除已使用的 reply token（每個 token 只能使用一次）."""
+        self._tokens.pop(reply_token, None)
+
+    def _prune(self, now: float) -> None:
+        """移除過期或超出上限的 token."""
+        while self._tokens:
+            token, info = next(iter(self._tokens.items()))
+            if info.deadline >= now and len(self._tokens) < self.max_tracked:
+                break
+            self._tokens.pop(token)
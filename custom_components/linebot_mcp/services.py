@@ -2,12 +2,17 @@
 from __future__ import annotations
 
 import logging
-from functools import lru_cache
+from functools import partial
 from typing import Any, Dict
 
 from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
 from homeassistant.helpers.service import async_set_service_schema
 
+from .dispatcher import (
+    PRIORITY_PUSH,
+    PRIORITY_BROADCAST,
+    MessageDeferredError,
+)
 from .line_api_client import (
     create_text_message,
     create_text_v2_message,
@@ -25,9 +30,14 @@ from .const import (
     CONF_NAME,
     ATTR_REPLY_TOKEN,
     LINE_API_CLIENT,
+    PUSH_COALESCER,
+    MESSAGE_DISPATCHER,
     SERVICE_NOTIFY,
     SERVICE_REPLY_MESSAGE,
     SERVICE_PUSH_MESSAGE,
+    SERVICE_MULTICAST_MESSAGE,
+    SERVICE_BROADCAST_MESSAGE,
+    SERVICE_NARROWCAST_MESSAGE,
     SERVICE_TEXT_CONTENT,
     SERVICE_TEXT_V2_CONTENT,
     SERVICE_IMAGE_CONTENT,
@@ -40,6 +50,9 @@ from .const import (
     SERVICE_TEMPLATE_CONTENT,
     REPLY_MESSAGE_SCHEMA,
     PUSH_MESSAGE_SCHEMA,
+    MULTICAST_MESSAGE_SCHEMA,
+    BROADCAST_MESSAGE_SCHEMA,
+    NARROWCAST_MESSAGE_SCHEMA,
     CREATE_TEXT_SCHEMA,
     CREATE_TEXT_V2_SCHEMA,
     CREATE_IMAGE_SCHEMA,
@@ -52,6 +65,9 @@ from .const import (
     CREATE_TEMPLATE_SCHEMA,
     REPLY_MESSAGE_DESCRIBE,
     PUSH_MESSAGE_DESCRIBE,
+    MULTICAST_MESSAGE_DESCRIBE,
+    BROADCAST_MESSAGE_DESCRIBE,
+    NARROWCAST_MESSAGE_DESCRIBE,
 )
 
 
@@ -107,14 +123,51 @@ class LineBotServiceManager:
     def __init__(self, hass: HomeAssistant):
         """初始化服務管理器."""
         self.hass = hass
-        self._clients: Dict[str, Any] = {}
 
     @property
     def service_registry(self) :
         """服務註冊映射."""
         notify = [
-            (SERVICE_NOTIFY,SERVICE_REPLY_MESSAGE,self.reply_message,REPLY_MESSAGE_SCHEMA,REPLY_MESSAGE_DESCRIBE),
-            (SERVICE_NOTIFY,SERVICE_PUSH_MESSAGE,self.push_message,PUSH_MESSAGE_SCHEMA,PUSH_MESSAGE_DESCRIBE),
+            (
+                SERVICE_NOTIFY,
+                SERVICE_REPLY_MESSAGE,
+                self.reply_message,
+                REPLY_MESSAGE_SCHEMA,
+                REPLY_MESSAGE_DESCRIBE,
+                SupportsResponse.NONE
+            ),
+            (
+                SERVICE_NOTIFY,
+                SERVICE_PUSH_MESSAGE,
+                self.push_message,
+                PUSH_MESSAGE_SCHEMA,
+                PUSH_MESSAGE_DESCRIBE,
+                SupportsResponse.OPTIONAL
+            ),
+            (
+                SERVICE_NOTIFY,
+                SERVICE_MULTICAST_MESSAGE,
+                self.multicast_message,
+                MULTICAST_MESSAGE_SCHEMA,
+                MULTICAST_MESSAGE_DESCRIBE,
+                SupportsResponse.NONE
+            ),
+            (
+                SERVICE_NOTIFY,
+                SERVICE_BROADCAST_MESSAGE,
+                self.broadcast_message,
+                BROADCAST_MESSAGE_SCHEMA,
+                BROADCAST_MESSAGE_DESCRIBE,
+                SupportsResponse.NONE
+            ),
+            (
+                SERVICE_NOTIFY,
+                SERVICE_NARROWCAST_MESSAGE,
+                self.narrowcast_message,
+                NARROWCAST_MESSAGE_SCHEMA,
+                NARROWCAST_MESSAGE_DESCRIBE,
+                SupportsResponse.NONE
+            ),
         ]
         content = [
             (DOMAIN,SERVICE_TEXT_CONTENT,self.create_text_content,CREATE_TEXT_SCHEMA,SupportsResponse.ONLY),
@@ -150,25 +203,13 @@ class LineBotServiceManager:
                 and LINE_API_CLIENT in entry_data
             )
         }
-    
-    @lru_cache(maxsize=10)
-    def _get_client(self, name: str):
-        """獲取 LINE API 客戶端."""
-        if not name:
-            raise ValueError("Invalid bot name")
-
-        if not self._clients:
-            self._clients = self.get_bot_client
 
-        if name in self._clients:
-            return self._clients[name]
-
-        self._clients = self.get_bot_client
-        api_client = self._clients.get(name)
-        if not api_client:
-            raise ValueError(f"LINE API client not found: {name}")
-
-        return api_client
+    def get_entry_data(self, name: str) -> Dict[str, Any]:
+        """依 Bot 名稱取得配置資料."""
+        for entry_data in self.hass.data.get(DOMAIN, {}).values():
+            if isinstance(entry_data, dict) and entry_data.get(CONF_NAME) == name:
+                return entry_data
+        raise ValueError(f"LINE Bot not found: {name}")
 
     async def _create_content_dict(self, message_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """根據資料建立訊息字典."""
@@ -176,23 +217,32 @@ class LineBotServiceManager:
         creator = MESSAGE_CREATORS.get(message_type)
         return creator(data)
 
-    async def _send_message_service(self, call: ServiceCall, is_reply: bool = True) -> None:
-        """通用訊息發送服務處理器."""
+    async def _send_message_service(
+        self, call: ServiceCall, action: str = "reply"
+    ) -> ServiceResponse:
+        """通用訊息發送服務處理器.
+
+        所有發送都經由 Bot 的派送佇列；push 可指定 wait=False，
+        排入佇列後立即回傳工作 ID。
+        """
         try:
             bot_name = call.data[CONF_NAME]
             message_count = len(call.data["messages"])
 
-            # 獲取 LINE API 客戶端
-            line_api_client = self._get_client(bot_name)
+            # 獲取 LINE API 客戶端與派送佇列（每次重新取得，重新載入後即使用新的客戶端）
+            entry_data = self.get_entry_data(bot_name)
+            line_api_client = entry_data[LINE_API_CLIENT]
+            dispatcher = entry_data[MESSAGE_DISPATCHER]
 
             # 取得可選參數
             retry_key = call.data.get("retry_key")
             notification_disabled = call.data.get(
                 "notification_disabled", False
             )
+            wait = call.data.get("wait", True)
 
-            if is_reply:
-                await line_api_client.reply_message(
+            if action == "reply":
+                await dispatcher.reply(
                     reply_token=call.data[ATTR_REPLY_TOKEN],
                     messages=call.data["messages"],
                     notification_disabled=notification_disabled
@@ -200,30 +250,116 @@ class LineBotServiceManager:
                 _LOGGER.info(
                     f"Reply {message_count} message(s) sent successfully for bot: {bot_name}"
                 )
-            else:
-                await line_api_client.push_message(
-                    to=call.data["to"],
-                    messages=call.data["messages"],
-                    notification_disabled=notification_disabled,
-                    retry_key=retry_key
-                )
+            elif action == "push":
+                job_id = None
+                coalescer = entry_data.get(PUSH_COALESCER)
+                if coalescer is not None and not retry_key:
+                    # 指定 retry_key 的訊息需保持獨立請求，不參與合併
+                    future = coalescer.add(
+                        to=call.data["to"],
+                        messages=call.data["messages"],
+                        notification_disabled=notification_disabled,
+                    )
+                    if not wait:
+                        job_id = dispatcher.track(future, "push")
+                    else:
+                        await future
+                else:
+                    factory = partial(
+                        line_api_client.push_message,
+                        to=call.data["to"],
+                        messages=call.data["messages"],
+                        notification_disabled=notification_disabled,
+                        retry_key=retry_key
+                    )
+                    if not wait:
+                        job_id = await dispatcher.enqueue(PRIORITY_PUSH, factory, "push")
+                    else:
+                        await dispatcher.run(PRIORITY_PUSH, factory, "push")
+
+                # wait=False 回傳工作 ID，結果另以事件回報；wait=True 已送出
+                status = f"queued as job {job_id}" if not wait else "sent successfully"
                 _LOGGER.info(
-                    f"Push {message_count} message(s) sent successfully to "
+                    f"Push {message_count} message(s) {status} to "
                     f"{call.data['to']} for bot: {bot_name}"
                 )
+                return {"job_id": job_id} if not wait else {"sent": True}
+            elif action == "multicast":
+                await dispatcher.run(
+                    PRIORITY_BROADCAST,
+                    partial(
+                        line_api_client.multicast_all,
+                        to=call.data["to"],
+                        messages=call.data["messages"],
+                        notification_disabled=notification_disabled,
+                        retry_key=retry_key
+                    ),
+                    "multicast",
+                )
+                _LOGGER.info(
+                    f"Multicast {message_count} message(s) sent successfully to "
+                    f"{len(call.data['to'])} user(s) for bot: {bot_name}"
+                )
+            elif action == "broadcast":
+                await dispatcher.run(
+                    PRIORITY_BROADCAST,
+                    partial(
+                        line_api_client.broadcast,
+                        messages=call.data["messages"],
+                        notification_disabled=notification_disabled,
+                        retry_key=retry_key
+                    ),
+                    "broadcast",
+                )
+                _LOGGER.info(
+                    f"Broadcast {message_count} message(s) sent successfully for bot: {bot_name}"
+                )
+            elif action == "narrowcast":
+                await dispatcher.run(
+                    PRIORITY_BROADCAST,
+                    partial(
+                        line_api_client.narrowcast,
+                        messages=call.data["messages"],
+                        recipient=call.data.get("recipient"),
+                        filter_dict=call.data.get("filter"),
+                        limit=call.data.get("limit"),
+                        notification_disabled=notification_disabled,
+                        retry_key=retry_key
+                    ),
+                    "narrowcast",
+                )
+                _LOGGER.info(
+                    f"Narrowcast {message_count} message(s) sent successfully for bot: {bot_name}"
+                )
 
+        except MessageDeferredError as e:
+            _LOGGER.warning(f"{e}")
+            return {"job_id": e.job_id} if action == "push" else None
         except Exception as e:
-            action = "reply" if is_reply else "push"
             _LOGGER.error(f"Error sending {action} message: {e}")
 
+        return None
+
     # service callback
     async def reply_message(self, call: ServiceCall) -> None:
         """回覆訊息服務."""
-        await self._send_message_service(call, is_reply=True)
+        await self._send_message_service(call, "reply")
 
-    async def push_message(self, call: ServiceCall) -> None:
+    async def push_message(self, call: ServiceCall) -> ServiceResponse:
         """推送訊息服務."""
-        await self._send_message_service(call, is_reply=False)
+        return await self._send_message_service(call, "push")
+
+    async def multicast_message(self, call: ServiceCall) -> None:
+        """群發訊息服務."""
+        await self._send_message_service(call, "multicast")
+
+    async def broadcast_message(self, call: ServiceCall) -> None:
+        """廣播訊息服務."""
+        await self._send_message_service(call, "broadcast")
+
+    async def narrowcast_message(self, call: ServiceCall) -> None:
+        """Narrowcast 訊息服務."""
+        await self._send_message_service(call, "narrowcast")
     
     async def create_text_content(self, call: ServiceCall) -> ServiceResponse:
         """建立文字訊息內容."""
@@ -269,8 +405,10 @@ class LineBotServiceManager:
         """設定全域 LINE Bot 服務."""
         notify, content = self.service_registry
         
-        for domain, service, handler, schema, describe in notify:
-            self.hass.services.async_register(domain, service, handler, schema=schema)
+        for domain, service, handler, schema, describe, supports_response in notify:
+            self.hass.services.async_register(
+                domain, service, handler, schema=schema, supports_response=supports_response
+            )
             async_set_service_schema(self.hass, domain, service, describe)
 
         for domain, service, handler, schema, supports_response in content:
@@ -288,7 +426,7 @@ class LineBotServiceManager:
 
         notify, content = self.service_registry
 
-        for domain, service, _, _ in notify:
+        for domain, service, _, _, _, _ in notify:
             if self.hass.services.has_service(domain, service):
                 self.hass.services.async_remove(domain, service)
 
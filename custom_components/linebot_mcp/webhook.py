@@ -2,29 +2,42 @@
 from __future__ import annotations
 
 import asyncio
+import base64
+import hashlib
+import hmac
 import logging
-import json
-import re
-from string import Template
+from functools import partial
 
 from aiohttp import web
 from homeassistant.components.http import KEY_HASS, HomeAssistantView
 
-from linebot.v3 import WebhookParser
-from linebot.v3.exceptions import InvalidSignatureError
-from linebot.v3.webhooks import (
+from .message_schema import build_auto_reply_prompt, extract_reply_messages
+from .webhook_events import (
     MessageEvent,
     PostbackEvent,
+    parse_events,
 )
-
+from .dispatcher import PRIORITY_PUSH
 from .line_api_client import (
+    LineApiError,
     create_text_message,
 )
 from .const import (
     DOMAIN,
     CONF_AGENT_ID,
     CONF_AUTO_REPLY,
+    CONF_FAST_WEBHOOK_DECODER,
+    CONF_AUTO_REPLY_PROMPT,
+    CONF_AUTO_REPLY_SCHEMA_ONCE,
+    CONF_AUTO_REPLY_LOADING,
+    CONF_AUTO_REPLY_PARTIAL_AFTER,
+    CONF_AUTO_REPLY_PARTIAL_TEXT,
     LINE_API_CLIENT,
+    MESSAGE_DISPATCHER,
+    WEBHOOK_DEDUP,
+    WEBHOOK_EXECUTOR,
+    AUTO_REPLY_DEBOUNCER,
+    CONVERSATION_CACHE,
     EVENT_MESSAGE_RECEIVED,
     EVENT_POSTBACK,
     ATTR_USER_ID,
@@ -37,6 +50,8 @@ from .const import (
     ATTR_TIMESTAMP,
     ATTR_SOURCE_TYPE,
     LINE_SIGNATURE,
+    WEBHOOK_PARSE_EXECUTOR_THRESHOLD,
+    AUTO_REPLY_TIMEOUT,
     ERROR_INVALID_SIGNATURE,
     ERROR_INTERNAL_SERVER,
 )
@@ -61,13 +76,22 @@ class LineBotWebhookView(HomeAssistantView):
         self.entry_id = entry_id
         self.botname = botname
         self.channel_secret = channel_secret
+        self._secret_key = channel_secret.encode("utf-8")
         self._config_entry = None
         self._agent_id = None
         self._auto_reply = None 
+        self._auto_reply_prompt = None
+        self._schema_once = None
+        self._conversations = None
+        self._loading = None
+        self._partial_after = None
+        self._partial_text = None
+        self._fast_decoder = None
         self._client = None
-
-        # 初始化 webhook parser
-        self.parser = WebhookParser(self.channel_secret)
+        self._dispatcher = None
+        self._dedup = None
+        self._executor = None
+        self._debouncer = None
 
         _LOGGER.debug(f"Webhook view initialized for path: {self.url}")
 
@@ -78,48 +102,78 @@ class LineBotWebhookView(HomeAssistantView):
 
             if self._config_entry is None:
                 self._config_entry = self.hass.config_entries.async_get_entry(self.entry_id)
-            if self._client is None:
-                self._client = self.hass.data[DOMAIN][self.entry_id][LINE_API_CLIENT]
 
-            self._agent_id = self.hass.data[DOMAIN][self.entry_id][CONF_AGENT_ID]
-            self._auto_reply = self.hass.data[DOMAIN][self.entry_id][CONF_AUTO_REPLY]
+            # 每次請求重新取得：重新載入配置項目後這些物件會重建，
+            # 但已註冊的視圖仍是同一個
+            config_data = self.hass.data[DOMAIN][self.entry_id]
+            self._client = config_data[LINE_API_CLIENT]
+            self._dispatcher = config_data[MESSAGE_DISPATCHER]
+            self._dedup = config_data[WEBHOOK_DEDUP]
+            self._executor = config_data[WEBHOOK_EXECUTOR]
+            self._debouncer = config_data.get(AUTO_REPLY_DEBOUNCER)
+            self._agent_id = config_data[CONF_AGENT_ID]
+            self._auto_reply = config_data[CONF_AUTO_REPLY]
+            self._auto_reply_prompt = config_data[CONF_AUTO_REPLY_PROMPT]
+            self._schema_once = config_data[CONF_AUTO_REPLY_SCHEMA_ONCE]
+            self._conversations = config_data[CONVERSATION_CACHE]
+            self._loading = config_data[CONF_AUTO_REPLY_LOADING]
+            self._partial_after = config_data[CONF_AUTO_REPLY_PARTIAL_AFTER]
+            self._partial_text = config_data[CONF_AUTO_REPLY_PARTIAL_TEXT]
+            self._fast_decoder = config_data[CONF_FAST_WEBHOOK_DECODER]
             
 
             # 取得簽名和請求內容
             signature = request.headers[LINE_SIGNATURE]
-            body = await request.text()
+            body = await request.read()
 
             _LOGGER.debug(f"Received webhook request with signature: {signature}")
-            _LOGGER.debug(f"Request body: {body}")
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug(f"Request body: {body.decode('utf-8', 'replace')}")
 
-            # 驗證簽名並解析事件
-            try:
-                events = self.parser.parse(body, signature)
-            except InvalidSignatureError:
+            # 驗證簽名（僅 HMAC，直接在事件迴圈執行）
+            if not self._verify_signature(body, signature):
                 _LOGGER.error("Invalid signature from webhook")
                 return web.Response(status=400, text=ERROR_INVALID_SIGNATURE)
+
+            # 解析事件；使用 line-bot-sdk 解析大量事件時改在執行緒中建立模型，避免阻塞事件迴圈
+            if not self._fast_decoder and len(body) > WEBHOOK_PARSE_EXECUTOR_THRESHOLD:
+                events = await self.hass.async_add_executor_job(
+                    partial(parse_events, body, fast=False)
+                )
+            else:
+                events = parse_events(body, fast=self._fast_decoder)
+
+            # 略過 LINE 重送且已處理過的事件
+            events = [event for event in events if not self._is_duplicate(event)]
             
-            def _create_task(event):
-                if isinstance(event, MessageEvent):
-                    return self._config_entry.async_create_task(
-                        self.hass,
-                        self._handle_message_event(event),
-                        f"{self.botname}: MessageEvent"
-                    )
-                elif isinstance(event, PostbackEvent):
-                    return self._config_entry.async_create_task(
-                        self.hass,
-                        self._handle_postback_event(event),
-                        f"{self.botname}: PostbackEvent"
+            # 記錄 reply token 的到期時間與來源，供回覆排程與過期時改用 push
+            for event in events:
+                if reply_token := getattr(event, "reply_token", None):
+                    self._dispatcher.reply_tokens.register(
+                        reply_token,
+                        getattr(event, "timestamp", None),
+                        self._get_source_id(getattr(event, "source", None)),
                     )
+
+            # 以事件類型分派（輕量事件與 line-bot-sdk 事件具有相同屬性），
+            # 同一對話的事件依序處理
+            for event in events:
+                if event.type == "message":
+                    handler, description = self._handle_message_event, "MessageEvent"
+                elif event.type == "postback":
+                    handler, description = self._handle_postback_event, "PostbackEvent"
                 else:
-                    return self._config_entry.async_create_task(
-                        self.hass,
-                        self._handle_default(event),
-                        f"{self.botname}: DefaultEvent"
-                    )
-            
-            tasks = [_create_task(event) for event in events]
+                    handler, description = self._handle_default, "DefaultEvent"
+
+                # 執行器接受後才記錄事件 ID，被丟棄的事件可由 LINE 重送後再處理
+                event_id = getattr(event, "webhook_event_id", None)
+                if self._executor.submit(
+                    self._get_source_id(getattr(event, "source", None)) or "",
+                    partial(handler, event),
+                    description,
+                    on_drop=partial(self._dedup.forget, event_id),
+                ):
+                    self._dedup.record(event_id)
 
             return web.Response(status=200, text="OK")
 
@@ -149,119 +203,24 @@ class LineBotWebhookView(HomeAssistantView):
         if message.type == "text":
             event_data[ATTR_MESSAGE_TYPE] = "text"
             event_data[ATTR_MESSAGE_TEXT] = message.text
-            try:
-                if self._auto_reply:
-                    tpl = Template("""
-                    User's message: $user_text
-                    Answer using the structured format defined in the JSON Schema below.
-                    {
-                    "type": "object",
-                    "properties": {
-                        "messages": {
-                            "type": "array",
-                            "description": "Array of messages to send",
-                            "items": {
-                                "type": "object",
-                                "description": "LINE message: text, image, or location",
-                                "oneOf": [
-                                    {
-                                        "properties": {
-                                            "type": {
-                                                "type": "string",
-                                                "enum": ["text"],
-                                                "description": "Text message"
-                                            },
-                                            "text": {
-                                                "type": "string",
-                                                "description": "Message content",
-                                                "maxLength": 5000
-                                            }
-                                        },
-                                        "required": ["type", "text"]
-                                    },
-                                    {
-                                        "properties": {
-                                            "type": {
-                                                "type": "string",
-                                                "enum": ["image"],
-                                                "description": "Image message"
-                                            },
-                                            "originalContentUrl": {
-                                                "type": "string",
-                                                "format": "uri",
-                                                "description": "HTTPS URL of original image (JPEG/PNG, max 10MB)",
-                                                "maxLength": 2000
-                                            },
-                                            "previewImageUrl": {
-                                                "type": "string",
-                                                "format": "uri",
-                                                "description": "HTTPS URL of preview image (max 1MB)",
-                                                "maxLength": 2000
-                                            }
-                                        },
-                                        "required": ["type", "originalContentUrl", "previewImageUrl"]
-                                    },
-                                    {
-                                        "properties": {
-                                            "type": {
-                                                "type": "string",
-                                                "enum": ["location"],
-                                                "description": "Location message"
-                                            },
-                                            "title": {
-                                                "type": "string",
-                                                "description": "Location title/label"
-                                            },
-                                            "address": {
-                                                "type": "string",
-                                                "description": "Full address"
-                                            },
-                                            "latitude": {
-                                                "type": "number",
-                                                "description": "Latitude coordinate"
-                                            },
-                                            "longitude": {
-                                                "type": "number",
-                                                "description": "Longitude coordinate"
-                                            }
-                                        },
-                                        "required": ["type", "address", "latitude", "longitude"]
-                                    }
-                                ]
-                            },
-                            "minItems": 1,
-                            "maxItems": 5    
-                        }
-                    },
-                    "required": ["messages"]
-                    }
-                    """)
-                    user_msg = tpl.substitute(user_text=event_data[ATTR_MESSAGE_TEXT])
-
-                    # 調用 conversation 服務進行自動回覆
-                    response = await self.hass.services.async_call(
-                        "conversation",
-                        "process",
-                        {
-                            "language": "zh-TW",
-                            "agent_id": self._agent_id,
-                            "text": user_msg,
-                            "conversation_id": event_data[ATTR_USER_ID] if event_data[ATTR_USER_ID] else "",
-                        },
-                        blocking=True,
-                        return_response=True,
+            if self._auto_reply:
+                if self._debouncer is not None:
+                    # 合併同一對話連續傳送的訊息
+                    self._debouncer.submit(
+                        self._get_source_id(source) or "",
+                        message.text,
+                        event.reply_token,
+                        source.type,
+                        self._auto_reply_turn,
                     )
-                    if response:
-                        _LOGGER.info(f"{response}")
-
-                        speech = response["response"]["speech"]["plain"]["speech"]
-                        data = self.extract_json_or_text(speech)
-                        await self._client.reply_message(event_data[ATTR_REPLY_TOKEN], data)
-                        
-                    _LOGGER.info(f"Auto reply triggered for user {event_data.get(ATTR_USER_ID)}")
-            except Exception as e:
-                raise RuntimeError(f"Auto reply error: {e}") from e
-                
+                else:
+                    await self._auto_reply_turn(
+                        message.text,
+                        event.reply_token,
+                        source.type,
+                        self._get_source_id(source),
+                    )
+
         elif message.type == "image":
             event_data[ATTR_MESSAGE_TYPE] = "image"
         elif message.type == "video":
@@ -294,6 +253,115 @@ class LineBotWebhookView(HomeAssistantView):
             f"Received message from user {event_data.get(ATTR_USER_ID)}: {message_display}"
         )
 
+    async def _auto_reply_turn(
+        self,
+        text: str,
+        reply_token: str | None,
+        source_type: str,
+        target: str | None,
+    ) -> None:
+        """以對話代理產生回覆並送出.
+
+        每個用戶、群組或聊天室各自延續對話代理的對話；對話已過期時
+        改附上近期對話摘要。對話代理超過設定秒數仍未回應時，先以
+        reply token 送出等候訊息，取得回覆後再以 push 送給原始來源。
+        """
+        agent_task = None
+        try:
+            context = self._conversations.get(source_type, target or "")
+            new_session = context.session_expired
+            if new_session:
+                context.schema_sent = False
+            conversation_id = None if new_session else context.conversation_id
+            include_schema = not self._schema_once or not context.schema_sent
+
+            user_msg = build_auto_reply_prompt(
+                text,
+                self._auto_reply_prompt,
+                include_schema=include_schema,
+                history=context.history_prompt() if new_session else "",
+            )
+            service_data = {
+                "language": "zh-TW",
+                "agent_id": self._agent_id,
+                "text": user_msg,
+            }
+            if conversation_id:
+                service_data["conversation_id"] = conversation_id
+
+            self._start_loading(target)
+
+            # 調用 conversation 服務進行自動回覆
+            agent_task = self.hass.async_create_task(
+                self.hass.services.async_call(
+                    "conversation",
+                    "process",
+                    service_data,
+                    blocking=True,
+                    return_response=True,
+                ),
+                f"{self.botname}: auto reply agent",
+            )
+
+            partial_sent = False
+            async with asyncio.timeout(AUTO_REPLY_TIMEOUT):
+                if self._partial_after and reply_token and target:
+                    done, _ = await asyncio.wait({agent_task}, timeout=self._partial_after)
+                    if not done:
+                        await self._dispatcher.reply(
+                            reply_token, [create_text_message(self._partial_text)]
+                        )
+                        partial_sent = True
+                        self._start_loading(target)
+                response = await agent_task
+
+            if response:
+                _LOGGER.info(f"{response}")
+
+                # 對話代理開啟了新的對話時，schema 是否已送出以本輪為準
+                returned_id = response.get("conversation_id")
+                if returned_id != conversation_id:
+                    context.schema_sent = include_schema
+                else:
+                    context.schema_sent = context.schema_sent or include_schema
+                context.conversation_id = returned_id
+                context.touch()
+
+                speech = response["response"]["speech"]["plain"]["speech"]
+                data = self.extract_json_or_text(speech)
+                context.add_turn(text, self._summarize_reply(data))
+                if partial_sent:
+                    # reply token 已用於等候訊息，改以 push 送出
+                    await self._dispatcher.run(
+                        PRIORITY_PUSH,
+                        partial(self._client.push_message, to=target, messages=data),
+                        "auto reply",
+                    )
+                else:
+                    await self._dispatcher.reply(reply_token, data)
+
+            _LOGGER.info(f"Auto reply triggered for {source_type} {target}")
+        except Exception as e:
+            raise RuntimeError(f"Auto reply error: {e}") from e
+        finally:
+            if agent_task is not None and not agent_task.done():
+                agent_task.cancel()
+
+    def _start_loading(self, target: str | None) -> None:
+        """在一對一聊天顯示載入動畫"""
+        if not self._loading or not target or not target.startswith("U"):
+            return
+
+        async def _start() -> None:
+            try:
+                await self._client.start_loading_animation(target)
+            except LineApiError as e:
+                _LOGGER.debug(f"Failed to start loading animation for {target}: {e}")
+
+        self.hass.async_create_background_task(
+            _start(), f"{self.botname}: loading animation"
+        )
+
     async def _handle_postback_event(self, event: PostbackEvent) -> None:
         """處理回傳事件"""
         user_id = getattr(event.source, "user_id", None)
@@ -314,26 +382,49 @@ class LineBotWebhookView(HomeAssistantView):
             f"Received postback from user {user_id or 'unknown'}: {event_data['postback_data']}"
         )
 
-    def _handle_default(self, event):
+    @staticmethod
+    def _summarize_reply(messages: list) -> str:
+        """將回覆訊息轉為對話摘要文字"""
+        return " ".join(
+            message["text"] if message.get("type") == "text" else f"[{message.get('type')}]"
+            for message in messages
+        )
+
+    def _verify_signature(self, body: bytes, signature: str) -> bool:
+        """驗證 X-Line-Signature"""
+        digest = hmac.new(self._secret_key, body, hashlib.sha256).digest()
+        return hmac.compare_digest(base64.b64encode(digest), signature.encode("utf-8"))
+
+    def _is_duplicate(self, event) -> bool:
+        """檢查是否為已處理過的重送事件"""
+        if not self._dedup.is_duplicate(getattr(event, "webhook_event_id", None)):
+            return False
+
+        delivery_context = getattr(event, "delivery_context", None)
+        _LOGGER.info(
+            f"{self.botname}: dropping duplicate webhook event {event.webhook_event_id} "
+            f"(redelivery: {getattr(delivery_context, 'is_redelivery', None)})"
+        )
+        return True
+
+    @staticmethod
+    def _get_source_id(source) -> str | None:
+        """取得事件來源的 push 目標 ID（群組 > 聊天室 > 用戶）"""
+        if source is None:
+            return None
+        return (
+            getattr(source, "group_id", None)
+            or getattr(source, "room_id", None)
+            or getattr(source, "user_id", None)
+        )
+
+    async def _handle_default(self, event):
         """處理預設事件"""
         _LOGGER.debug(f"Received default event: {event}")
     
-    def extract_json_or_text(self, response_speech: str) -> dict:
+    def extract_json_or_text(self, response_speech: str) -> list:
         """
         嘗試從 LLM 回傳的 speech 中解析出 JSON 格式內容，
         如果沒有，就當成純文字包裝成 {"text": "..."}。
         """
-        try:
-            # 嘗試使用正規表達式抓出第一個 JSON block
-            match = re.sub(r"^```json\s*|\s*```$", "", response_speech.strip())
-            if match:
-                result = json.loads(match)
-
-                if isinstance(result, dict) and "messages" in result:
-                    return result["messages"]
-        except json.JSONDecodeError:
-            pass
-
-        # 若抓不到 JSON，就把整段內容包裝成 text
-        msg = create_text_message(str(response_speech).strip())
-        return [msg]
\ No newline at end of file
+        return extract_reply_messages(response_speech)
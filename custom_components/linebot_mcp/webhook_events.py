@@ -0,0 +1,173 @@
+"""LINE webhook 事件輕量解碼器.
+
+只保留整合實際使用的欄位，避免為每個事件建立完整的 line-bot-sdk 模型；
+無法辨識的事件類型仍交由 line-bot-sdk 解析。
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from homeassistant.util.json import json_loads
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# 輕量解碼器支援的訊息類型
+SUPPORTED_MESSAGE_TYPES = frozenset(
+    {"text", "image", "video", "audio", "file", "location", "sticker"}
+)
+
+
+@dataclass(slots=True)
+class Source:
+    """事件來源"""
+
+    type: str
+    user_id: Optional[str] = None
+    group_id: Optional[str] = None
+    room_id: Optional[str] = None
+
+
+@dataclass(slots=True)
+class DeliveryContext:
+    """事件傳遞資訊"""
+
+    is_redelivery: bool = False
+
+
+@dataclass(slots=True)
+class MessageContent:
+    """訊息內容（依訊息類型僅部分欄位有值）"""
+
+    type: str
+    id: Optional[str] = None
+    text: Optional[str] = None
+    file_name: Optional[str] = None
+    file_size: Optional[int] = None
+    title: Optional[str] = None
+    address: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    package_id: Optional[str] = None
+    sticker_id: Optional[str] = None
+
+
+@dataclass(slots=True)
+class PostbackContent:
+    """Postback 內容"""
+
+    data: str
+    params: Optional[Dict[str, Any]] = None
+
+
+@dataclass(slots=True)
+class WebhookEvent:
+    """Webhook 事件"""
+
+    type: str
+    timestamp: Optional[int]
+    mode: Optional[str]
+    webhook_event_id: Optional[str]
+    delivery_context: Optional[DeliveryContext]
+    source: Optional[Source]
+    reply_token: Optional[str]
+
+
+@dataclass(slots=True)
+class MessageEvent(WebhookEvent):
+    """訊息事件"""
+
+    message: MessageContent
+
+
+@dataclass(slots=True)
+class PostbackEvent(WebhookEvent):
+    """Postback 事件"""
+
+    postback: PostbackContent
+
+
+def parse_events(body: bytes, fast: bool = True) -> List[Any]:
+    """解析 webhook 內容.
+
+    :param fast: 使用輕量解碼器，否則全部交由 line-bot-sdk 解析
+    """
+    raw_events = json_loads(body)["events"]
+    if not fast:
+        return [_parse_sdk_event(raw) for raw in raw_events]
+    return [_decode_event(raw) or _parse_sdk_event(raw) for raw in raw_events]
+
+
+def _decode_event(raw: Dict[str, Any]) -> Optional[WebhookEvent]:
+    """以輕量物件解碼事件，不支援的類型回傳 None."""
+    event_type = raw.get("type")
+
+    if event_type == "message":
+        message = raw.get("message") or {}
+        if message.get("type") not in SUPPORTED_MESSAGE_TYPES:
+            return None
+        return MessageEvent(
+            **_decode_common(raw),
+            message=MessageContent(
+                type=message["type"],
+                id=message.get("id"),
+                text=message.get("text"),
+                file_name=message.get("fileName"),
+                file_size=message.get("fileSize"),
+                title=message.get("title"),
+                address=message.get("address"),
+                latitude=message.get("latitude"),
+                longitude=message.get("longitude"),
+                package_id=message.get("packageId"),
+                sticker_id=message.get("stickerId"),
+            ),
+        )
+
+    if event_type == "postback":
+        postback = raw.get("postback") or {}
+        return PostbackEvent(
+            **_decode_common(raw),
+            postback=PostbackContent(
+                data=postback.get("data", ""),
+                params=postback.get("params"),
+            ),
+        )
+
+    return None
+
+
+def _decode_common(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """解碼所有事件共用的欄位"""
+    source = raw.get("source")
+    delivery_context = raw.get("deliveryContext")
+    return {
+        "type": raw["type"],
+        "timestamp": raw.get("timestamp"),
+        "mode": raw.get("mode"),
+        "webhook_event_id": raw.get("webhookEventId"),
+        "delivery_context": DeliveryContext(
+            is_redelivery=delivery_context.get("isRedelivery", False)
+        ) if delivery_context else None,
+        "source": Source(
+            type=source.get("type"),
+            user_id=source.get("userId"),
+            group_id=source.get("groupId"),
+            room_id=source.get("roomId"),
+        ) if source else None,
+        "reply_token": raw.get("replyToken"),
+    }
+
+
+def _parse_sdk_event(raw: Dict[str, Any]) -> Any:
+    """以 line-bot-sdk 解析事件（與 WebhookParser.parse 相同）"""
+    # 延遲載入，僅在需要時才匯入 line-bot-sdk
+    from linebot.v3.models.events import UnknownEvent
+    from linebot.v3.webhooks import Event
+
+    try:
+        return Event.from_dict(raw)
+    except ValueError:
+        _LOGGER.info(f"Unknown event type: {raw.get('type')}")
+        return UnknownEvent.new_from_json_dict(raw)
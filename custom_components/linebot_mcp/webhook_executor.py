@@ -0,0 +1,153 @@
+"""Webhook 事件處理的有界執行器."""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    WEBHOOK_CONCURRENCY,
+    WEBHOOK_QUEUE_SIZE,
+    SHED_POLICY_DROP_NEWEST,
+    SHED_POLICY_DROP_OLDEST,
+)
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _PendingEvent:
+    """等待處理的事件."""
+
+    seq: int
+    key: str
+    factory: Callable[[], Awaitable[None]]
+    description: str
+    on_drop: Callable[[], None] | None = None
+
+
+class WebhookEventExecutor:
+    """每個 Bot 的 webhook 事件執行器.
+
+    同時執行的處理數量受 semaphore 限制，等待中的事件數量有上限，
+    超過時依設定丟棄最新或最舊的事件；同一對話的事件依到達順序逐一處理。
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        botname: str,
+        max_concurrency: int = WEBHOOK_CONCURRENCY,
+        max_pending: int = WEBHOOK_QUEUE_SIZE,
+        shed_policy: str = SHED_POLICY_DROP_NEWEST,
+    ) -> None:
+        """初始化執行器."""
+        self.hass = hass
+        self.entry = entry
+        self.botname = botname
+        self.max_pending = max_pending
+        self.shed_policy = shed_policy
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._sequence = itertools.count()
+        # 對話鍵值 -> 等待中的事件（FIFO）
+        self._queues: dict[str, deque[_PendingEvent]] = {}
+        self._runners: dict[str, asyncio.Task] = {}
+        self._pending = 0
+        self._dropped = 0
+
+    @property
+    def pending(self) -> int:
+        """等待處理的事件數"""
+        return self._pending
+
+    @property
+    def dropped(self) -> int:
+        """因超過上限而丟棄的事件數"""
+        return self._dropped
+
+    def submit(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[None]],
+        description: str = "event",
+        on_drop: Callable[[], None] | None = None,
+    ) -> bool:
+        """排入事件，被丟棄時回傳 False.
+
+        :param on_drop: 已排入的事件之後因佇列已滿被丟棄時呼叫
+        """
+        if self._pending >= self.max_pending and not self._shed(description):
+            return False
+
+        queue = self._queues.setdefault(key, deque())
+        queue.append(_PendingEvent(next(self._sequence), key, factory, description, on_drop))
+        self._pending += 1
+
+        if key not in self._runners:
+            self._runners[key] = self.entry.async_create_background_task(
+                self.hass,
+                self._run(key, queue),
+                f"{self.botname}: webhook {description}",
+            )
+        return True
+
+    def _shed(self, description: str) -> bool:
+        """佇列已滿時依策略丟棄事件，可排入新事件時回傳 True."""
+        if self.shed_policy == SHED_POLICY_DROP_OLDEST and self._drop_oldest():
+            return True
+
+        self._dropped += 1
+        _LOGGER.warning(
+            f"{self.botname}: webhook queue is full ({self.max_pending} pending), "
+            f"dropping {description}"
+        )
+        return False
+
+    def _drop_oldest(self) -> bool:
+        """丟棄最早排入且尚未開始處理的事件."""
+        oldest = min(
+            (queue[0] for queue in self._queues.values() if queue),
+            key=lambda pending: pending.seq,
+            default=None,
+        )
+        if oldest is None:
+            return False
+
+        self._queues[oldest.key].popleft()
+        self._pending -= 1
+        self._dropped += 1
+        if oldest.on_drop is not None:
+            oldest.on_drop()
+        _LOGGER.warning(
+            f"{self.botname}: webhook queue is full ({self.max_pending} pending), "
+            f"dropping oldest {oldest.description}"
+        )
+        return True
+
+    async def _run(self, key: str, queue: deque[_PendingEvent]) -> None:
+        """依序處理同一對話的事件."""
+        try:
+            while queue:
+                pending = queue.popleft()
+                self._pending -= 1
+                async with self._semaphore:
+                    try:
+                        await pending.factory()
+                    except Exception as e:
+                        _LOGGER.error(
+                            f"{self.botname}: error handling {pending.description}: {e}"
+                        )
+        finally:
+            # 取消時一併移除尚未處理的事件
+            self._pending -= len(queue)
+            queue.clear()
+            self._queues.pop(key, None)
+            self._runners.pop(key, None)
@@ -0,0 +1,44 @@
+"""Push 合併佇列測試."""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from custom_components.linebot_mcp.coalescer import PushCoalescer
+from custom_components.linebot_mcp.line_api_client import LineApiError
+
+
+MESSAGES = [{"type": "text", "text": "hi"}]
+
+
+def test_rejected_multicast_falls_back_to_individual_push() -> None:
+    """multicast 因單一收件者被拒絕時，其他收件者仍以 push 送達."""
+
+    async def _push(to, messages, notification_disabled):
+        if to == "Ubad":
+            raise LineApiError("LINE API error: 400 - The property, 'to', is invalid", 400)
+        return f"sent to {to}"
+
+    async def _test() -> None:
+        loop = asyncio.get_running_loop()
+        hass = SimpleNamespace(loop=loop, async_create_task=lambda coro, name: loop.create_task(coro))
+        client = SimpleNamespace(
+            multicast=AsyncMock(side_effect=LineApiError("LINE API error: 400", 400)),
+            push_message=AsyncMock(side_effect=_push),
+        )
+        coalescer = PushCoalescer(hass, client, window=0.01)
+
+        good = coalescer.add("Ugood", MESSAGES)
+        other = coalescer.add("Uother", MESSAGES)
+        bad = coalescer.add("Ubad", MESSAGES)
+        await coalescer.close()
+
+        client.multicast.assert_awaited_once()
+        assert client.push_message.await_count == 3
+        assert good.result() == "sent to Ugood"
+        assert other.result() == "sent to Uother"
+        with pytest.raises(LineApiError):
+            bad.result()
+
+    asyncio.run(_test())
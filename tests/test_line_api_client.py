@@ -0,0 +1,25 @@
+"""LINE API 客戶端測試."""
+import asyncio
+import uuid
+from unittest.mock import AsyncMock
+
+from custom_components.linebot_mcp.const import LINE_MULTICAST_MAX_RECIPIENTS
+from custom_components.linebot_mcp.line_api_client import LineApiClient
+
+
+def test_multicast_all_accepts_non_uuid_retry_key() -> None:
+    """分批群發時任意字串的 retry_key 都能衍生出各批固定的 UUID."""
+    client = LineApiClient(None, "token")
+    client.multicast = AsyncMock()
+    recipients = [f"U{index:032x}" for index in range(LINE_MULTICAST_MAX_RECIPIENTS + 1)]
+
+    asyncio.run(client.multicast_all(recipients, [{"type": "text", "text": "hi"}], retry_key="job-1"))
+    asyncio.run(client.multicast_all(recipients, [{"type": "text", "text": "hi"}], retry_key="job-1"))
+
+    keys = [call.kwargs["retry_key"] for call in client.multicast.await_args_list]
+    assert len(keys) == 4
+    # 兩批不同，重新呼叫時相同
+    assert keys[0] != keys[1]
+    assert keys[:2] == keys[2:]
+    for key in keys:
+        uuid.UUID(key)
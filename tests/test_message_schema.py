@@ -0,0 +1,39 @@
+"""自動回覆訊息解析測試."""
+import time
+
+from custom_components.linebot_mcp.message_schema import extract_reply_messages
+
+
+REPLY = '{"messages": [{"type": "text", "text": "hi"}]}'
+EXPECTED = [{"type": "text", "text": "hi"}]
+
+
+def test_plain_json() -> None:
+    """純 JSON 回應."""
+    assert extract_reply_messages(REPLY) == EXPECTED
+
+
+def test_json_in_code_block_with_trailing_comma() -> None:
+    """程式碼區塊中帶結尾逗號的 JSON."""
+    speech = '```json\n{"messages": [{"type": "text", "text": "hi",},],}\n```'
+    assert extract_reply_messages(speech) == EXPECTED
+
+
+def test_unmatched_brace_before_json() -> None:
+    """JSON 前的說明文字有未閉合的括號."""
+    assert extract_reply_messages(f"Here {{oops. {REPLY}") == EXPECTED
+
+
+def test_prose_without_json_falls_back_to_text() -> None:
+    """沒有 JSON 時整段包裝成文字訊息."""
+    assert extract_reply_messages("no json {here") == [
+        {"type": "text", "text": "no json {here"}
+    ]
+
+
+def test_many_unmatched_braces_scan_once() -> None:
+    """大量未閉合的括號仍只掃描一次."""
+    speech = "{ " * 20000 + REPLY
+    started = time.perf_counter()
+    assert extract_reply_messages(speech) == EXPECTED
+    assert time.perf_counter() - started < 1
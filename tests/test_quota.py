@@ -0,0 +1,39 @@
+"""訊息配額帳本測試."""
+from custom_components.linebot_mcp import quota
+from custom_components.linebot_mcp.quota import QuotaLedger
+
+
+def test_roll_over_resets_usage_and_notifies(monkeypatch) -> None:
+    """跨月時重置上個月的用量並通知（延後的 broadcast 可恢復）."""
+    monkeypatch.setattr(quota, "_current_period", lambda: (2026, 1))
+    ledger = QuotaLedger()
+    ledger.reconcile("limited", 200, 190)
+    ledger.record(10)
+    assert ledger.remaining == 0
+    assert not ledger.admit(None)
+
+    notified = []
+    ledger.add_listener(lambda: notified.append(ledger.usage))
+
+    monkeypatch.setattr(quota, "_current_period", lambda: (2026, 2))
+    ledger.roll_over()
+
+    assert notified == [0]
+    assert ledger.usage == 0
+    assert ledger.remaining == 200
+    assert ledger.admit(None)
+
+    # 已重置後不再重複通知
+    ledger.roll_over()
+    assert notified == [0]
+
+
+def test_usage_after_month_change_ignores_previous_month(monkeypatch) -> None:
+    """跨月後尚未收到重置通知時，用量也不沿用上個月的累計."""
+    monkeypatch.setattr(quota, "_current_period", lambda: (2026, 1))
+    ledger = QuotaLedger()
+    ledger.reconcile("limited", 200, 100)
+    ledger.record(50)
+
+    monkeypatch.setattr(quota, "_current_period", lambda: (2026, 2))
+    assert ledger.usage == 0
@@ -0,0 +1,40 @@
+"""MCP 工具參數驗證測試."""
+import pytest
+
+from custom_components.linebot_mcp.mcp_core.validation import (
+    SchemaValidationError,
+    compile_schema,
+)
+from custom_components.linebot_mcp.message_schema import LINE_MESSAGE_SCHEMA
+
+
+MESSAGES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "botID": {"type": "string", "enum": ["bot1", "bot2"]},
+        "messages": {"type": "array", "items": LINE_MESSAGE_SCHEMA, "minItems": 1},
+    },
+    "required": ["botID", "messages"],
+}
+
+
+def test_valid_arguments() -> None:
+    """符合 schema 的參數不引發例外."""
+    validate = compile_schema(MESSAGES_SCHEMA)
+    validate({"botID": "bot1", "messages": [{"type": "text", "text": "hi"}]})
+
+
+def test_list_valued_type_is_rejected() -> None:
+    """oneOf 的 type 為 list 時回報 type 欄位，而非 TypeError."""
+    validate = compile_schema(MESSAGES_SCHEMA)
+    with pytest.raises(SchemaValidationError) as err:
+        validate({"botID": "bot1", "messages": [{"type": ["text"], "text": "hi"}]})
+    assert err.value.path == "messages[0].type"
+
+
+def test_dict_valued_enum_is_rejected() -> None:
+    """enum 欄位為 dict 時回報該欄位，而非 TypeError."""
+    validate = compile_schema(MESSAGES_SCHEMA)
+    with pytest.raises(SchemaValidationError) as err:
+        validate({"botID": {}, "messages": [{"type": "text", "text": "hi"}]})
+    assert err.value.path == "botID"